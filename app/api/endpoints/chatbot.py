@@ -1,29 +1,62 @@
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from app.services.chatbot_service import ChatbotService
+from app.services.registry import registry
+from app.api.sse import sse_response
 
 # Define the router for chatbot endpoints
 router = APIRouter()
-chatbot_service = ChatbotService()
+
+
+def get_chatbot_service() -> ChatbotService:
+    """
+    Returns the chatbot service, or a 503 while it is still warming up.
+    """
+    if registry.chatbot is None:
+        raise HTTPException(status_code=503, detail="The chatbot service is starting up. Please retry shortly.")
+    return registry.chatbot
+
 # Pydantic model for the request body
 class ChatRequest(BaseModel):
     message: str
+    # Omit to start a new conversation; reuse the returned id to continue it
+    session_id: Optional[str] = None
 
 # Pydantic model for the response body
 class ChatResponse(BaseModel):
     reply: str
+    session_id: str
 
 @router.post("/message", response_model=ChatResponse)
-async def handle_chat_message(request: ChatRequest):
+async def handle_chat_message(request: ChatRequest, chatbot_service: ChatbotService = Depends(get_chatbot_service)):
     """
     Endpoint to handle an incoming chat message.
     This is a placeholder and would typically call a service function.
     """
     # In a real application, you would call a service function like:
     # reply = chatbot_service.get_response(request.user_id, request.message)
+    session_id = request.session_id
     try:
-        reply = chatbot_service.get_concise_answer(request.message)
+        reply, session_id = await chatbot_service.chat(request.message, session_id=request.session_id)
     except:
         reply = "Sorry, I'm having trouble processing your request right now."
+        session_id = chatbot_service.ensure_session_id(session_id)
+
+    return ChatResponse(reply=reply, session_id=session_id)
+
+
+@router.post("/message/stream")
+async def stream_chat_message(request: ChatRequest, chatbot_service: ChatbotService = Depends(get_chatbot_service)):
+    """
+    Streams the answer to a chat message as Server-Sent Events: "session"
+    (with the session id), one "token" event per piece of the answer, then "done".
+    """
+    session_id = chatbot_service.ensure_session_id(request.session_id)
+
+    async def events():
+        yield {"event": "session", "data": {"session_id": session_id}}
+        async for event in chatbot_service.stream_concise_answer(request.message, session_id=session_id):
+            yield event
 
-    return ChatResponse(reply=reply)
+    return sse_response(events())
@@ -1,26 +1,43 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List
 from app.services.summarize_service import SummarizeService
+from app.services.registry import registry
+from app.api.sse import sse_response
+from app.api.ndjson import ndjson_response
+from app.config import settings
 
 # Define the router for summarization endpoints
 router = APIRouter()
-summarize_service = SummarizeService()
+
+
+def get_summarize_service() -> SummarizeService:
+    """
+    Returns the summarization service, or a 503 while it is still warming up.
+    """
+    if registry.summarize is None:
+        raise HTTPException(status_code=503, detail="The summarization service is starting up. Please retry shortly.")
+    return registry.summarize
 
 # Pydantic model for the request body
 class SummarizeRequest(BaseModel):
     text: str
 
 
+# Pydantic model for the batch request body
+class SummarizeBatchRequest(BaseModel):
+    queries: List[str]
+
+
 # Pydantic model for the response body
 class SummarizeResponse(BaseModel):
     summary: str
     visualization_data: Dict[str, Any]
 
 @router.post("/", response_model=SummarizeResponse)
-async def create_summary(request: SummarizeRequest):
+async def create_summary(request: SummarizeRequest, summarize_service: SummarizeService = Depends(get_summarize_service)):
     # Call the summarization service with the incoming text
-    result = summarize_service.generate_summary(request.text)
+    result = await summarize_service.generate_summary(request.text)
 
     # Extract expected fields with safe defaults
     summary_text = result.get("summary", "")
@@ -30,4 +47,32 @@ async def create_summary(request: SummarizeRequest):
     return SummarizeResponse(
         summary=summary_text,
         visualization_data=visualization_data
-    )
\ No newline at end of file
+    )
+
+
+@router.post("/stream")
+async def stream_summary(request: SummarizeRequest, summarize_service: SummarizeService = Depends(get_summarize_service)):
+    """
+    Streams the summary as Server-Sent Events: one "token" event per piece of
+    the summary as it is generated, then "visualization" with the chart data,
+    then "done".
+    """
+    return sse_response(summarize_service.stream_summary(request.text))
+
+
+@router.post("/batch")
+async def create_summaries(request: SummarizeBatchRequest, summarize_service: SummarizeService = Depends(get_summarize_service)):
+    """
+    Summarizes a list of topics and streams the results as NDJSON: one line
+    per topic, {"index", "query", "summary", "visualization_data"}, written
+    as each summary completes (so not necessarily in request order).
+    """
+    queries = request.queries
+    if not queries or any(not query.strip() for query in queries):
+        raise HTTPException(status_code=400, detail="Provide a list of non-empty queries.")
+    if len(queries) > settings.SUMMARIZE_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SUMMARIZE_BATCH_MAX_QUERIES} queries can be summarized per request.",
+        )
+    return ndjson_response(summarize_service.generate_summaries(queries))
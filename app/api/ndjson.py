@@ -0,0 +1,19 @@
+import json
+from typing import Any, AsyncIterator, Dict
+from fastapi.responses import StreamingResponse
+
+
+def ndjson_response(items: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """
+    Streams dicts from a service as newline-delimited JSON, one object per line.
+    """
+    async def body():
+        async for item in items:
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        # Disable proxy buffering so each line reaches the client immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
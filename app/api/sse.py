@@ -0,0 +1,26 @@
+import json
+from typing import Any, AsyncIterator, Dict
+from fastapi.responses import StreamingResponse
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Formats one Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """
+    Streams {"event", "data"} dicts from a service as Server-Sent Events.
+    """
+    async def body():
+        async for event in events:
+            yield format_sse(event["event"], event.get("data", {}))
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # Disable proxy buffering so each event reaches the client immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
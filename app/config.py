@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -11,6 +12,110 @@ class Settings(BaseSettings):
     GROQ_API_KEY: str
     PINECONE_API_KEY: str
     GEMINI_API_KEY: str
+
+    # Size of the thread pool used for blocking work (embedding, Pinecone)
+    # so it does not run on the event loop.
+    BLOCKING_EXECUTOR_WORKERS: int = 4
+
+    # Per-conversation chat history limits.
+    CHAT_HISTORY_MAX_TURNS: int = 6
+    CHAT_SESSION_TTL_SECONDS: float = 1800
+    CHAT_MAX_SESSIONS: int = 10000
+    # When False only the user's question is kept in the history, not the
+    # full retrieval prompt sent with it.
+    CHAT_HISTORY_KEEP_CONTEXT: bool = False
+
+    # Vector index backend: "pinecone", or "local" for the in-process index
+    # stored under LOCAL_INDEX_PATH.
+    VECTOR_BACKEND: str = "pinecone"
+    LOCAL_INDEX_PATH: str = "data/index"
+    # Local index type: "flat" (exact) or "ivf" (approximate). IVF_N_PROBE is
+    # the recall/latency knob; IVF_N_LISTS = 0 picks ~4*sqrt(N) lists.
+    LOCAL_INDEX_TYPE: str = "flat"
+    IVF_N_LISTS: int = 0
+    IVF_N_PROBE: int = 8
+    IVF_MIN_TRAIN_SIZE: int = 10000
+
+    # Fetch only ids and scores from the vector index and read chunk text,
+    # title and authors from the local document store at DOCUMENT_STORE_PATH.
+    RETRIEVAL_HYDRATE_LOCALLY: bool = False
+    DOCUMENT_STORE_PATH: str = "data/documents"
+
+    # Retrieval: chunks scoring below RETRIEVAL_MIN_SCORE (cosine similarity)
+    # are dropped, and with RETRIEVAL_ADAPTIVE_TOP_K results stop at the knee
+    # of the score curve, keeping at least RETRIEVAL_MIN_RESULTS chunks.
+    RETRIEVAL_MIN_SCORE: float = 0.2
+    RETRIEVAL_ADAPTIVE_TOP_K: bool = True
+    RETRIEVAL_MIN_RESULTS: int = 5
+
+    # Number of chunks retrieved for chatbot answers.
+    CHATBOT_TOP_K: int = 20
+
+    # Drop exact and near-duplicate retrieved chunks; chunks whose word 3-gram
+    # shingles have at least this Jaccard similarity count as duplicates.
+    CHUNK_DEDUP_ENABLED: bool = True
+    CHUNK_DEDUP_THRESHOLD: float = 0.8
+
+    # Embedding inference backend: "torch" (sentence-transformers) or "onnx"
+    # (ONNX Runtime, no torch import). ONNX_MODEL_FILE selects the export, e.g.
+    # "onnx/model_qint8_avx512.onnx" for int8 weights; ONNX_MODEL_DIR points at
+    # a local copy instead of downloading from the Hugging Face hub.
+    EMBEDDING_BACKEND: str = "torch"
+    ONNX_MODEL_FILE: str = "onnx/model.onnx"
+    ONNX_MODEL_DIR: Optional[str] = None
+    ONNX_NUM_THREADS: int = 0
+
+    # Micro-batching of concurrent query encodes: requests arriving within
+    # EMBEDDING_BATCH_WINDOW_MS of each other share one forward pass.
+    EMBEDDING_MICRO_BATCHING: bool = True
+    EMBEDDING_BATCH_WINDOW_MS: float = 3.0
+    EMBEDDING_MAX_BATCH_SIZE: int = 32
+
+    # Query embedding cache. Set EMBEDDING_CACHE_PATH to also keep embeddings
+    # in an on-disk SQLite file that survives restarts.
+    EMBEDDING_CACHE_SIZE: int = 2048
+    EMBEDDING_CACHE_TTL_SECONDS: float = 86400
+    EMBEDDING_CACHE_PATH: Optional[str] = None
+
+    # Cache of processed retrieval results, keyed by (embedding, top_k, filter).
+    RETRIEVAL_CACHE_SIZE: int = 512
+    RETRIEVAL_CACHE_TTL_SECONDS: float = 600
+
+    # Local gate in front of the LLM "should this be a chart?" check. Scores at
+    # or above YES / at or below NO are decided locally; the rest go to the LLM.
+    # Off until the thresholds are tuned on an eval set built from retrieved
+    # contexts (python -m benchmarks.visualization_gate --build).
+    VISUALIZATION_GATE_ENABLED: bool = False
+    VISUALIZATION_GATE_YES: float = 4.5
+    VISUALIZATION_GATE_NO: float = -0.5
+
+    # Build charts from (label, value, unit) figures found in the retrieved
+    # chunks, and fall back to the LLM unless one chunk has MIN_POINTS values
+    # sharing a unit whose labels mostly mention the query.
+    CHART_EXTRACTION_ENABLED: bool = True
+    CHART_EXTRACTION_MIN_POINTS: int = 2
+
+    # Finished summaries, reused when a query retrieves the same chunks and its
+    # embedding is at least SIMILARITY close to a cached query. Kept in memory
+    # and, with SUMMARY_CACHE_PATH set, in a SQLite file shared by workers.
+    SUMMARY_CACHE_ENABLED: bool = True
+    SUMMARY_CACHE_SIZE: int = 256
+    SUMMARY_CACHE_TTL_SECONDS: float = 3600
+    SUMMARY_CACHE_SIMILARITY: float = 0.95
+    SUMMARY_CACHE_PATH: Optional[str] = "data/summary_cache.db"
+
+    # Concurrent identical summarize / chat requests share one computation.
+    REQUEST_COALESCING_ENABLED: bool = True
+
+    # Batch summarize endpoint: most topics per request, and most summaries
+    # generated by the LLM at the same time.
+    SUMMARIZE_BATCH_MAX_QUERIES: int = 500
+    SUMMARIZE_BATCH_CONCURRENCY: int = 4
+
+    # Incremental ingestion: per-chunk content hashes, and the log through
+    # which changed papers are invalidated in running servers' caches.
+    INGEST_MANIFEST_PATH: str = "data/ingest_manifest.db"
+    INVALIDATION_LOG_PATH: Optional[str] = "data/invalidations.jsonl"
     
     # This tells pydantic-settings to load variables from a .env file.
     model_config = SettingsConfigDict(env_file=".env")
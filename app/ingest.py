@@ -0,0 +1,53 @@
+"""
+Bulk ingestion command for the research-papers index.
+
+Usage:
+    python -m app.ingest papers.csv [papers2.jsonl ...] [--text-column abstract]
+    python -m app.ingest papers.csv --incremental [--prune]
+"""
+import argparse
+from app.services.ingestion_service import IngestionService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest research papers into the vector index.")
+    parser.add_argument("paths", nargs="+", help="CSV or JSONL files with one paper per row.")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--title-column", default="title")
+    parser.add_argument("--authors-column", default="authors")
+    parser.add_argument("--id-column", default="id", help="Paper id column; the title hash is used when missing.")
+    parser.add_argument("--chunksize", type=int, default=1000, help="Rows read per chunk.")
+    parser.add_argument("--passage-words", type=int, default=200)
+    parser.add_argument("--overlap-words", type=int, default=40)
+    parser.add_argument("--encode-batch-size", type=int, default=256)
+    parser.add_argument("--upsert-batch-size", type=int, default=None)
+    parser.add_argument("--upsert-workers", type=int, default=8)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only embed new or changed passages and delete removed ones.")
+    parser.add_argument("--prune", action="store_true",
+                        help="With --incremental, the files are the whole corpus: delete papers missing from them.")
+    args = parser.parse_args()
+    if args.prune and not args.incremental:
+        parser.error("--prune requires --incremental")
+
+    service = IngestionService(
+        passage_words=args.passage_words,
+        overlap_words=args.overlap_words,
+        encode_batch_size=args.encode_batch_size,
+        upsert_batch_size=args.upsert_batch_size,
+        upsert_workers=args.upsert_workers,
+        incremental=args.incremental,
+    )
+    service.ingest(
+        args.paths,
+        text_column=args.text_column,
+        title_column=args.title_column,
+        authors_column=args.authors_column,
+        id_column=args.id_column,
+        chunksize=args.chunksize,
+        prune=args.prune,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,28 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from app.api.endpoints import chatbot, summarize, dashboard
+from app.services.registry import registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts warming up the services in the background so the server binds
+    immediately; /readyz reports when they can take traffic.
+    """
+    warm_up = asyncio.create_task(registry.warm_up())
+    yield
+    warm_up.cancel()
+
 
 # Create the FastAPI app instance
 app = FastAPI(
     title="AI Services API",
     description="An API for chatbot, summarization, and dashboard services.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Include the routers from the endpoints
@@ -21,3 +38,29 @@ async def read_root():
     A simple health check endpoint.
     """
     return {"message": "Welcome to the AI Services API!"}
+
+
+@app.get("/healthz", tags=["Root"])
+async def healthz():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz", tags=["Root"])
+async def readyz():
+    """
+    Readiness probe: the embedding model is loaded and the vector index is
+    reachable. Includes the duration of each warm-up phase.
+    """
+    status = await registry.check_readiness()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/stats", tags=["Root"])
+async def stats():
+    """
+    Cache hit/miss counters and sizes for this worker process.
+    """
+    return await asyncio.to_thread(registry.cache_stats)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+
+class LRUCache:
+    """
+    A thread-safe in-memory cache with a size bound (least recently used entries
+    are evicted first) and an optional time-to-live per entry.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # key -> (expires_at or None, value)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns the cached value for `key`, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any):
+        """
+        Stores `value` under `key`, evicting the oldest entries if needed.
+        """
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """
+        Removes a single entry.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        Removes every entry whose value matches `predicate`.
+
+        Returns:
+            The number of entries removed.
+        """
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns hit/miss counters and the current size.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+class DiskCache:
+    """
+    A persistent key/value cache backed by a SQLite file, so entries survive
+    restarts. Keys are strings and values are pickled.
+
+    The file may be shared by several worker processes: it uses WAL mode so
+    readers do not block the writer, and waits up to `timeout` seconds for a
+    lock instead of failing with "database is locked".
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, timeout: float = 30.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL, value BLOB)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for `key`, or None if it is missing or expired.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                expires_at, value = row
+                if expires_at is None or expires_at > time.time():
+                    self.hits += 1
+                    return pickle.loads(value)
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """
+        Stores `value` under `key`.
+        """
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+            )
+            self._conn.commit()
+
+    def invalidate(self, key: str):
+        """
+        Removes a single entry.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> int:
+        """
+        Removes every entry whose value matches `predicate`. Every value is
+        unpickled, so this is meant for occasional invalidation only.
+
+        Returns:
+            The number of entries removed.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM cache").fetchall()
+            stale = [(key,) for key, value in rows if predicate(pickle.loads(value))]
+            self._conn.executemany("DELETE FROM cache WHERE key = ?", stale)
+            self._conn.commit()
+            return len(stale)
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns hit/miss counters and the current size.
+        """
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+class InvalidationLog:
+    """
+    An append-only JSONL file through which the ingestion job tells running
+    server processes which papers changed, so they can drop cached results
+    for those papers. Readers only stat the file until it grows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offset = os.path.getsize(path) if os.path.exists(path) else 0
+        self._lock = threading.Lock()
+
+    def append(self, papers: Iterable[str]):
+        """
+        Records that the given papers (ids or titles) changed.
+        """
+        papers = sorted(set(papers))
+        if not papers:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.time(), "papers": papers}) + "\n")
+
+    def read_new(self) -> List[str]:
+        """
+        Returns the papers recorded since the last call.
+        """
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return []
+            if size < self._offset:
+                # The log was truncated or replaced; start over
+                self._offset = 0
+            if size == self._offset:
+                return []
+            papers = []
+            with open(self.path, "r", encoding="utf-8") as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith("\n"):
+                        # Partially written entry; read it next time
+                        break
+                    self._offset += len(line.encode("utf-8"))
+                    if line.strip():
+                        papers.extend(json.loads(line).get("papers", []))
+            return papers
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalizes query text for use as a cache key: lowercased with runs of
+    whitespace collapsed.
+    """
+    return " ".join(text.lower().split())
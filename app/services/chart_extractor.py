@@ -0,0 +1,230 @@
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+UNITS = (
+    r"%|percent|mg/kg|mg|µg|ug|kg|g|ml|mmHg|mm|cm|km|mSv|mGy|ms|m|minutes|min|s|hours|h|days|weeks|months|years|"
+    r"Sv|Gy|°C|bpm|Hz|kPa|Pa|fold|genes|cells|patients|subjects|participants|mice|rats|samples"
+)
+NUMBER = r"\d+(?:,\d{3})*(?:\.\d+)?"
+# A value with a unit, optionally as a range ("1.0% to 1.5%", "20-32%").
+VALUE = re.compile(
+    rf"(?<![\w.])(?P<low>{NUMBER})(?:\s*(?:{UNITS})?\s*(?:to|-|–)\s*(?P<high>{NUMBER}))?\s*(?P<unit>{UNITS})(?![\w/])"
+)
+# Where a label stops: sentence and clause breaks, and words that join two values.
+CLAUSE_BREAK = re.compile(r"[.;:,()\[\]]|\b(?:and|versus|vs|compared with|compared to|while|whereas|but|than)\b", re.I)
+# Words that introduce a value's subject after it ("13% in controls", "30% were engineers").
+LEADING_PREPOSITIONS = re.compile(r"^(?:in|for|among|on|with|of|from|were|was|are|is)\s+", re.I)
+# Words that introduce when or how long after a value ("13% after 17 days"). The
+# phrase qualifies the subject before the value instead of naming it.
+TIME_QUALIFIER = re.compile(r"^(?:after|during|at|within|by|over|before)\s+", re.I)
+# A rate right after the unit ("0.3 mSv per day") is part of the unit, not a label.
+PER_UNIT = re.compile(r"^per\s+\w+\s*", re.I)
+# A value right after one of these describes when or how long ("after 17 days"),
+# so it is part of another value's label rather than a data point of its own.
+QUALIFYING_PREPOSITIONS = {"after", "during", "for", "over", "within", "in", "at", "before", "per"}
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9])")
+QUERY_STOPWORDS = {
+    "the", "and", "for", "with", "what", "which", "how", "does", "are", "was", "were", "from", "into",
+    "between", "about", "compare", "comparison", "versus", "effect", "effects", "impact", "show", "chart",
+    "plot", "graph", "much", "many", "during", "after", "over", "this", "that", "there", "their",
+}
+FILLER_WORDS = {
+    "a", "an", "the", "by", "to", "of", "was", "were", "is", "are", "about", "approximately", "around",
+    "nearly", "roughly", "up", "only", "also", "had", "has", "have", "showed", "shows", "lost", "fell",
+    "dropped", "rose", "increased", "decreased", "declined", "reduced", "grew", "reached", "averaged",
+    "average", "mean", "median", "some", "further", "another", "in", "for", "with", "on", "at",
+    "from", "between", "ranged", "ranging",
+}
+TIME_WORDS = re.compile(r"\b(day|days|week|weeks|month|months|year|years|hour|hours|flight|baseline|landing|launch|pre|post)\b", re.I)
+
+COLORS = [
+    (54, 162, 235), (255, 99, 132), (75, 192, 192), (255, 159, 64),
+    (153, 102, 255), (255, 205, 86), (201, 203, 207), (46, 204, 113),
+]
+
+
+def _to_number(value: str) -> float:
+    return float(value.replace(",", ""))
+
+
+def _clean_label(words: List[str]) -> str:
+    while words and words[0].lower() in FILLER_WORDS:
+        words = words[1:]
+    while words and words[-1].lower() in FILLER_WORDS:
+        words = words[:-1]
+    return " ".join(words)
+
+
+def _label_for(text: str, start: int, end: int) -> Tuple[str, str]:
+    """
+    Names a value from the words around it: a phrase right after it
+    ("13% in controls", "30% were engineers") if there is one, else the last
+    few words of its clause before it ("soleus muscle volume decreased 13%").
+
+    Returns:
+        (label, time qualifier), where the qualifier is a phrase such as
+        "after 17 days" following the value, or "".
+    """
+    after = text[end:end + 80]
+    stop = CLAUSE_BREAK.search(after)
+    after = after[:stop.start()] if stop else after
+    after = PER_UNIT.sub("", after.strip())
+    qualifier = ""
+    if TIME_QUALIFIER.match(after):
+        words = after.split()[:4]
+        while words and words[-1].lower() in FILLER_WORDS:
+            words = words[:-1]
+        qualifier = " ".join(words)
+    elif LEADING_PREPOSITIONS.match(after):
+        label = _clean_label(LEADING_PREPOSITIONS.sub("", after).split()[:6])
+        if label:
+            return label, qualifier
+
+    before = text[max(0, start - 120):start]
+    breaks = list(CLAUSE_BREAK.finditer(before))
+    if breaks:
+        before = before[breaks[-1].end():]
+    return _clean_label(before.split()[-5:]), qualifier
+
+
+def extract_values(text: str) -> List[Tuple[str, float, str, str, int]]:
+    """
+    Pulls values out of text as (label, value, unit, time qualifier, sentence
+    index) tuples. Ranges become their midpoint.
+    """
+    values = []
+    for sentence_index, sentence in enumerate(SENTENCE_END.split(text)):
+        subject = ""
+        for match in VALUE.finditer(sentence):
+            preceding = sentence[max(0, match.start() - 20):match.start()].split()
+            if preceding and preceding[-1].lower() in QUALIFYING_PREPOSITIONS:
+                continue
+            value = _to_number(match.group("low"))
+            if match.group("high"):
+                value = (value + _to_number(match.group("high"))) / 2
+            unit = match.group("unit")
+            if unit.lower() == "percent":
+                unit = "%"
+            label, qualifier = _label_for(sentence, match.start(), match.end())
+            if not label and qualifier:
+                # "2% at 1 month, 5% at 3 months": later values share the subject
+                label = subject
+            if label:
+                subject = label
+                values.append((label, value, unit, qualifier, sentence_index))
+    return values
+
+
+def _query_terms(query: str) -> List[str]:
+    """
+    Returns the query's content words, cut to 5 letters so "densities"
+    matches "density".
+    """
+    words = re.findall(r"[a-z][a-z0-9]+", query.lower())
+    return [word[:5] for word in words if len(word) >= 3 and word not in QUERY_STOPWORDS]
+
+
+def _mentions(label: str, terms: List[str]) -> bool:
+    words = {word[:5] for word in re.findall(r"[a-z][a-z0-9]+", label.lower())}
+    return any(term in words for term in terms)
+
+
+def _chart_type(points: List[Tuple[str, float, str, int]], unit: str) -> str:
+    values = [value for _, value, _, _ in points]
+    # A pie needs parts of one whole, so all shares must come from one sentence
+    same_sentence = len({sentence for _, _, _, sentence in points}) == 1
+    if unit == "%" and len(values) >= 3 and same_sentence and abs(sum(values) - 100) <= 5:
+        return "pie"
+    # One subject measured at several times
+    subjects = {label.lower() for label, _, _, _ in points}
+    if len(points) >= 3 and len(subjects) == 1 and all(qualifier for _, _, qualifier, _ in points):
+        return "line"
+    return "bar"
+
+
+def _rgba(color: Tuple[int, int, int], alpha: float) -> str:
+    return f"rgba({color[0]}, {color[1]}, {color[2]}, {alpha})"
+
+
+def extract_chart(query: str, texts: Sequence[str], min_points: int = 2, max_points: int = 8) -> Optional[Dict[str, Any]]:
+    """
+    Builds a Chart.js config from the numbers in the text, in the same shape
+    the visualization prompt asks the LLM for.
+
+    Values are only charted together when they come from the same chunk and
+    share a unit, so figures from unrelated studies are never mixed, and at
+    least half of their labels must mention the query.
+
+    Args:
+        query: The user's query, used for the chart and dataset titles.
+        texts: The retrieved chunks to take the values from.
+        min_points: Fewest values in one chunk sharing a unit that make a chart.
+        max_points: Most values to plot.
+
+    Returns:
+        A Chart.js config dictionary, or None if no chunk has a chartable
+        group of values, in which case the LLM should be asked instead.
+    """
+    terms = _query_terms(query)
+    best = None
+    for text in texts:
+        by_unit = defaultdict(list)
+        for label, value, unit, qualifier, sentence in extract_values(text):
+            points = by_unit[unit]
+            name = f"{label} {qualifier}".strip()
+            if all(name.lower() != f"{seen} {seen_qualifier}".strip().lower() for seen, _, seen_qualifier, _ in points):
+                points.append((label, value, qualifier, sentence))
+        for unit, points in by_unit.items():
+            points = points[:max_points]
+            if len(points) < min_points:
+                continue
+            relevant = sum(_mentions(label, terms) for label, _, _, _ in points)
+            if relevant * 2 < len(points):
+                continue
+            # Prefer the group that mentions the query most, then the larger one
+            rank = (relevant, len(points))
+            if best is None or rank > best[0]:
+                best = (rank, unit, points)
+    if best is None:
+        return None
+
+    _, unit, points = best
+    chart_type = _chart_type(points, unit)
+    if chart_type == "line":
+        labels = [qualifier for _, _, qualifier, _ in points]
+    else:
+        labels = [f"{label} ({qualifier})" if qualifier else label for label, _, qualifier, _ in points]
+    values = [int(value) if value.is_integer() else round(value, 3) for _, value, _, _ in points]
+    if chart_type == "pie":
+        colors = [COLORS[i % len(COLORS)] for i in range(len(values))]
+        background = [_rgba(color, 0.5) for color in colors]
+        border = [_rgba(color, 1) for color in colors]
+    else:
+        background = _rgba(COLORS[0], 0.5)
+        border = _rgba(COLORS[0], 1)
+
+    options = {
+        "responsive": True,
+        "plugins": {
+            "legend": {"position": "top"},
+            "title": {"display": True, "text": query},
+        },
+    }
+    if chart_type != "pie":
+        options["scales"] = {"y": {"beginAtZero": True}}
+
+    return {
+        "type": chart_type,
+        "data": {
+            "labels": labels,
+            "datasets": [{
+                "label": f"{query} ({unit})",
+                "data": values,
+                "backgroundColor": background,
+                "borderColor": border,
+                "borderWidth": 1,
+            }],
+        },
+        "options": options,
+    }
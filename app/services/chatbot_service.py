@@ -1,7 +1,13 @@
 import google.generativeai as genai
 import os
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from app.config import settings
-from app.services.rag_service import RAGService
+from app.services.rag_service import get_rag_service
+from app.services.session_store import ChatSessionStore
+from app.services.context_builder import context_budget
+from app.services.single_flight import SingleFlight
+from app.services.cache import normalize_query
 
 class ChatbotService:
     """
@@ -36,13 +42,14 @@ class ChatbotService:
                     "API key not found. Please provide it as an argument or set "
                     "the GEMINI_API_KEY environment variable."
                 )
-        # Initialize the Gemini Pro model and start a chat session with a system prompt
+        # Initialize the Gemini Pro model
     
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.model_name = 'gemini-2.5-flash'
+        self.model = genai.GenerativeModel(self.model_name)
         # Keep responses short by default (adjustable)
         self.max_output_tokens = 150
-        # Start the chat with a system message so the assistant follows the concise, friendly style
-        self.chat = self.model.start_chat(history=[
+        # Every chat starts with a system message so the assistant follows the concise, friendly style
+        self.base_history = [
             {
                 "role": "user",
                 "parts": [{"text": self.SYSTEM_PROMPT}]
@@ -51,36 +58,39 @@ class ChatbotService:
                 "role": "model",
                 "parts": [{"text": "Understood. I will provide a concise answer based on the context."}]
             }
-        ])
+        ]
+        # Conversations are kept per session id with a bounded number of turns
+        self.sessions = ChatSessionStore(
+            max_turns=settings.CHAT_HISTORY_MAX_TURNS,
+            ttl_seconds=settings.CHAT_SESSION_TTL_SECONDS,
+            max_sessions=settings.CHAT_MAX_SESSIONS,
+        )
         
-        self.ragServe = RAGService()
+        self.ragServe = get_rag_service()
+        # Concurrent identical questions outside a session share one answer
+        self.in_flight = SingleFlight()
     
 
-    def get_concise_answer(self, query: str, context: str = "") -> str:
+    async def _prepare_prompt(self, query: str) -> Tuple[Optional[str], Optional[str]]:
         """
-        Gets a concise answer from the Gemini model based on a query and context.
-
-        Args:
-            query: The user's question.
-            context: Optional context to provide to the model.
+        Retrieves context for a query and builds the answer prompt.
 
         Returns:
-            A concise answer from the model.
+            (prompt, None), or (None, message) when no context was found.
         """
-        if not query:
-            return "Please provide a query."
-        
         print(f"Retrieving context for query: '{query}'...")
-        retrieved_texts, source_papers = self.ragServe.query(query, top_k=100)
+        # Short answers need far fewer chunks than a long-form summary
+        chunks = await self.ragServe.asearch(query, top_k=settings.CHATBOT_TOP_K)
             
             
-        if not retrieved_texts:
+        if not any(chunk.get('text') for chunk in chunks):
             print("No relevant context found by RAG service.")
             no_context_message = f"# No Information Found\n\nSorry, we could not find any relevant information for the topic: '{query}'. Please try a different query."
-            return {"summary": no_context_message, "visualization_data": {}, "sources": []}
+            return None, no_context_message
         
-        # Combine the retrieved text chunks into a single context string
-        context_str = "\n\n---\n\n".join(retrieved_texts)
+        # Pack the best retrieved chunks into a context string within the
+        # model's budget; only the papers of packed chunks are listed
+        context_str, source_papers = self.ragServe.pack_chunks(chunks, context_budget(self.model_name))
         sources_formatted = ""
         for i, paper in enumerate(source_papers):
             sources_formatted += f"[{i+1}] Title: {paper.get('title', 'N/A')}, Authors: {paper.get('authors', 'N/A')}\n"
@@ -105,13 +115,117 @@ class ChatbotService:
             f"--- --- ---\n\n"
             f"**Concise Answer (MAX 3 sentences):**"
         )
+        return prompt, None
+
+    def _start_chat(self, history: List[Dict[str, Any]]):
+        """
+        Starts a Gemini chat with the system prompt and a session's history.
+        """
+        return self.model.start_chat(history=self.base_history + history)
+
+    def _remember(self, session_id: Optional[str], query: str, prompt: str, answer: str):
+        """
+        Adds a finished question/answer pair to the session's history.
+        """
+        if session_id:
+            # Store only the question by default; the retrieval prompt is
+            # large and would be resent with every later turn.
+            user_text = prompt if settings.CHAT_HISTORY_KEEP_CONTEXT else query
+            self.sessions.add_turn(session_id, user_text, answer)
+
+    @staticmethod
+    def ensure_session_id(session_id: Optional[str]) -> str:
+        """
+        Returns `session_id`, or a new id when the client did not send one.
+        """
+        return session_id or uuid.uuid4().hex
+
+    async def chat(self, query: str, session_id: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Answers a chat message, starting a new session when `session_id` is None.
+
+        Returns:
+            (answer, session_id) — the id to send with the next message.
+        """
+        session_id = self.ensure_session_id(session_id)
+        return await self.get_concise_answer(query, session_id=session_id), session_id
+
+    async def get_concise_answer(self, query: str, context: str = "", session_id: str = None) -> str:
+        """
+        Gets a concise answer from the Gemini model based on a query and context.
+
+        Args:
+            query: The user's question.
+            context: Optional context to provide to the model.
+            session_id: Conversation to continue. Without one the question is
+                        answered without any earlier history.
+
+        Returns:
+            A concise answer from the model.
+        """
+        if not query:
+            return "Please provide a query."
+
+        history = self.sessions.get_history(session_id) if session_id else []
+        if history or not settings.REQUEST_COALESCING_ENABLED:
+            prompt, answer = await self._answer(query, history)
+        else:
+            # Without earlier turns the answer does not depend on the session,
+            # so concurrent identical questions share one generation
+            prompt, answer = await self.in_flight.do(normalize_query(query), lambda: self._answer(query, []))
+        if prompt is not None:
+            self._remember(session_id, query, prompt, answer)
+        return answer
+
+    async def _answer(self, query: str, history: List[Dict[str, Any]]) -> Tuple[Optional[str], str]:
+        """
+        Retrieves context and asks Gemini for the answer to one question.
+
+        Returns:
+            (prompt, answer), or (None, message) when there was no context or
+            the call failed, so the message is not stored as a turn.
+        """
+        prompt, no_context_message = await self._prepare_prompt(query)
+        if prompt is None:
+            return None, no_context_message
         
         try:
             # Ask the model with a low temperature for consistency and a token limit to keep answers concise.
-            response = self.chat.send_message(prompt)
+            chat = self._start_chat(history)
+            response = await chat.send_message_async(prompt)
             # Some client wrappers return the generated text on `.text`, others on `.content` — prefer `.text`.
             text = getattr(response, "text", None) or getattr(response, "content", None) or str(response)
-            return text.strip()
+            return prompt, text.strip()
         except Exception as e:
             # Basic error handling for the API call
-            return f"An error occurred: {e}"
\ No newline at end of file
+            return None, f"An error occurred: {e}"
+
+    async def stream_concise_answer(self, query: str, session_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answers like `get_concise_answer`, yielding {"event": "token", "data": {"text": ...}}
+        events as Gemini produces them, an "error" event on failure, and a final
+        {"event": "done", "data": {}}.
+        """
+        if not query:
+            yield {"event": "token", "data": {"text": "Please provide a query."}}
+            yield {"event": "done", "data": {}}
+            return
+
+        try:
+            prompt, no_context_message = await self._prepare_prompt(query)
+            if prompt is None:
+                yield {"event": "token", "data": {"text": no_context_message}}
+            else:
+                history = self.sessions.get_history(session_id) if session_id else []
+                chat = self._start_chat(history)
+                response = await chat.send_message_async(prompt, stream=True)
+                parts = []
+                async for chunk in response:
+                    text = getattr(chunk, "text", None)
+                    if text:
+                        parts.append(text)
+                        yield {"event": "token", "data": {"text": text}}
+                self._remember(session_id, query, prompt, "".join(parts).strip())
+        except Exception as e:
+            yield {"event": "error", "data": {"message": f"An error occurred: {e}"}}
+        yield {"event": "done", "data": {}}
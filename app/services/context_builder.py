@@ -0,0 +1,148 @@
+import re
+import hashlib
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+
+# Token budget for the retrieved context in each model's prompt. These leave
+# room for the instructions, the source list and the completion itself.
+MODEL_CONTEXT_BUDGETS = {
+    "llama-3.3-70b-versatile": 6000,
+    "llama-3.1-8b-instant": 3000,
+    "gemini-2.5-flash": 2000,
+}
+DEFAULT_CONTEXT_BUDGET = 2000
+
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+# Words, numbers and individual punctuation marks; a close, cheap stand-in for
+# BPE token counts on English text.
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Returns a fast estimate of the number of LLM tokens in `text`.
+    """
+    if not text:
+        return 0
+    # Long words are split into several sub-word tokens, roughly one per 4 characters.
+    return sum(max(1, len(piece) // 4) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def context_budget(model: str) -> int:
+    """
+    Returns the context token budget for a model.
+    """
+    return MODEL_CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+
+
+def truncate_to_budget(text: str, max_tokens: int) -> str:
+    """
+    Cuts `text` down to roughly `max_tokens` tokens, keeping the beginning.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    used = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += max(1, len(match.group()) // 4)
+        if used > max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+
+def pack_context(chunks: List[str], max_tokens: int) -> Tuple[str, List[int]]:
+    """
+    Packs retrieved chunks into a context string within a token budget.
+
+    Chunks are taken in the given order, which should be best-first; a chunk
+    that does not fit is skipped so smaller, lower-ranked chunks can still use
+    the remaining budget. If even the best chunk is too large it is truncated.
+
+    Args:
+        chunks: Retrieved text chunks, highest-scoring first.
+        max_tokens: Token budget for the whole context string.
+
+    Returns:
+        The joined context string and the indexes of the chunks it contains.
+    """
+    separator_tokens = estimate_tokens(CHUNK_SEPARATOR)
+    packed = []
+    used_indexes = []
+    used = 0
+    for i, chunk in enumerate(chunks):
+        cost = estimate_tokens(chunk) + (separator_tokens if packed else 0)
+        if used + cost <= max_tokens:
+            packed.append(chunk)
+            used_indexes.append(i)
+            used += cost
+        elif not packed:
+            packed.append(truncate_to_budget(chunk, max_tokens))
+            used_indexes.append(i)
+            used = max_tokens
+        if max_tokens - used <= separator_tokens:
+            break
+    return CHUNK_SEPARATOR.join(packed), used_indexes
+
+
+# MinHash parameters for near-duplicate detection: NUM_PERM random affine maps
+# (a * x + b) mod 2**32 with odd `a`, each a permutation of 32-bit hashes.
+NUM_PERM = 64
+_rng = np.random.default_rng(0)
+_MINHASH_A = (_rng.integers(0, 1 << 32, size=(NUM_PERM, 1), dtype=np.uint64) | 1).astype(np.uint32)
+_MINHASH_B = _rng.integers(0, 1 << 32, size=(NUM_PERM, 1), dtype=np.uint64).astype(np.uint32)
+
+
+def _minhash(text: str, size: int = 3) -> np.ndarray:
+    """
+    Returns the MinHash signature of the word `size`-gram shingles of
+    whitespace- and case-normalized text. The fraction of equal entries in
+    two signatures estimates the Jaccard similarity of the shingle sets.
+    """
+    words = text.lower().split()
+    word_hashes = np.fromiter((hash(word) & 0xFFFFFFFF for word in words), dtype=np.uint32, count=len(words))
+    # Combine each run of `size` word hashes, weighting by position so word order counts
+    hashes = word_hashes[:max(len(words) - size + 1, 1)].copy()
+    for offset in range(1, min(size, len(words))):
+        hashes = hashes * np.uint32(0x01000193) ^ word_hashes[offset:offset + len(hashes)]
+    return (_MINHASH_A * np.unique(hashes) + _MINHASH_B).min(axis=1)
+
+
+def deduplicate_chunks(chunks: Sequence[Optional[str]], similarity_threshold: float = 0.8) -> List[int]:
+    """
+    Drops exact and near-duplicate chunks, keeping the first (best-ranked) copy.
+
+    Exact duplicates are found by hashing whitespace- and case-normalized text.
+    Near duplicates are chunks whose word 3-gram shingles have an estimated
+    (MinHash) Jaccard similarity of at least `similarity_threshold` with an
+    already kept chunk. This works on the text the index already returns, so
+    no embeddings have to be fetched. Chunks without text are always kept.
+
+    Args:
+        chunks: Chunk texts in rank order.
+        similarity_threshold: Jaccard similarity above which two chunks count
+            as duplicates. Values above 1 disable the near-duplicate check.
+
+    Returns:
+        The indexes of the chunks to keep, in their original order.
+    """
+    seen_hashes = set()
+    kept = []
+    signatures = np.empty((len(chunks), NUM_PERM), dtype=np.uint32)
+    n_signatures = 0
+    for i, chunk in enumerate(chunks):
+        if chunk:
+            digest = hashlib.sha1(" ".join(chunk.lower().split()).encode("utf-8")).digest()
+            if digest in seen_hashes:
+                continue
+            seen_hashes.add(digest)
+
+            if similarity_threshold <= 1 and chunk.strip():
+                signature = _minhash(chunk)
+                if n_signatures and float(
+                    np.max(np.mean(signatures[:n_signatures] == signature, axis=1))
+                ) >= similarity_threshold:
+                    continue
+                signatures[n_signatures] = signature
+                n_signatures += 1
+        kept.append(i)
+    return kept
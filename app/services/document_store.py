@@ -0,0 +1,335 @@
+import os
+import re
+import json
+import mmap
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# One fixed-width index record per chunk write. A deleted chunk is recorded
+# with `text_length == DELETED`.
+RECORD = np.dtype([
+    ("id_hash", "<u8"),
+    ("paper_hash", "<u8"),
+    ("text_offset", "<u8"),
+    ("meta_offset", "<u8"),
+    ("text_length", "<u4"),
+    ("meta_length", "<u4"),
+])
+DELETED = 0xFFFFFFFF
+SEGMENT_NAME = re.compile(r"^seg-(\d+)\.ids\.npy$")
+
+
+class DocumentStore:
+    """
+    An on-disk store of chunk text and metadata keyed by chunk id, used to
+    hydrate vector search results locally instead of shipping metadata over
+    the network. Chunks can be looked up by id or by paper without reading
+    the whole index.
+
+    Layout:
+    - `blob.bin` (append-only): for each chunk, its UTF-8 text followed by a
+      JSON object with the rest of its metadata (id, title, authors, ...).
+    - `seg-NNNNNN.ids.npy`: an immutable index segment, one `RECORD` per
+      chunk written by one `add_many`/`delete` call, sorted by the 64-bit
+      hash of the chunk id. Newer segments win over older ones.
+    - `seg-NNNNNN.papers.npy`: the rows of the same segment ordered by
+      paper hash, for lookups by paper.
+
+    The blob and the segments are memory-mapped read-only, so a process only
+    touches the pages it looks up and forked workers share them through the
+    page cache. `text_view` returns chunk text as a view into the mapping,
+    without copying it. Small segments are merged as they accumulate, keeping the
+    number of segments logarithmic in the number of chunks. Bytes of
+    replaced or deleted chunks stay in the blob.
+    """
+
+    BLOB_FILE = "blob.bin"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._blob = None
+        # (segment number, records, rows ordered by paper hash), oldest first
+        self._segments: List[Tuple[int, np.ndarray, np.ndarray]] = []
+        self._signature = None
+        self._load()
+
+    @staticmethod
+    def paper_key(metadata: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the paper a chunk belongs to: its 'paper_id', else its 'title'.
+        """
+        return metadata.get("paper_id") or metadata.get("title")
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "little")
+
+    def _segment_path(self, number: int, kind: str) -> str:
+        return os.path.join(self.path, f"seg-{number:06d}.{kind}.npy")
+
+    def _segment_numbers(self) -> List[int]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            int(match.group(1)) for match in map(SEGMENT_NAME.match, os.listdir(self.path)) if match
+        )
+
+    def _stat_signature(self) -> Tuple[Tuple[int, ...], int]:
+        blob_path = os.path.join(self.path, self.BLOB_FILE)
+        blob_size = os.path.getsize(blob_path) if os.path.exists(blob_path) else 0
+        return tuple(self._segment_numbers()), blob_size
+
+    def _load(self):
+        """
+        Maps the index segments, then the blob they point into.
+        """
+        segments = []
+        for _ in range(5):
+            try:
+                segments = []
+                for number in self._segment_numbers():
+                    records = np.load(self._segment_path(number, "ids"), mmap_mode="r")
+                    paper_rows = np.load(self._segment_path(number, "papers"), mmap_mode="r")
+                    segments.append((number, records, paper_rows))
+                break
+            except FileNotFoundError:
+                # A merge in another process replaced segments while they were listed
+                continue
+        # Published blob first: readers take the segments, then the blob, so
+        # they never see records pointing past the blob they read from.
+        self._remap()
+        self._segments = segments
+        self._signature = self._stat_signature()
+
+    def _remap(self):
+        """
+        (Re)maps the blob file after it has grown. The previous mapping is not
+        closed explicitly so concurrent readers holding it stay valid; it is
+        released once no longer referenced.
+        """
+        blob_path = os.path.join(self.path, self.BLOB_FILE)
+        if os.path.exists(blob_path) and os.path.getsize(blob_path) > 0:
+            with open(blob_path, "rb") as f:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._blob = None
+
+    def refresh(self) -> bool:
+        """
+        Picks up chunks written by another process (e.g. the ingestion job)
+        since the store was opened or last refreshed.
+
+        Returns:
+            True if the store changed on disk and was re-mapped.
+        """
+        if self._stat_signature() == self._signature:
+            return False
+        with self._lock:
+            self._load()
+        return True
+
+    def _latest(self, segments, id_hash: int):
+        """
+        Yields the records for an id hash, newest first.
+        """
+        for _, records, _ in reversed(segments):
+            ids = records["id_hash"]
+            row = int(np.searchsorted(ids, id_hash))
+            while row < len(records) and ids[row] == id_hash:
+                yield records[row]
+                row += 1
+
+    def _read(self, blob, record) -> Dict[str, Any]:
+        text_offset, meta_offset = int(record["text_offset"]), int(record["meta_offset"])
+        metadata = json.loads(blob[meta_offset:meta_offset + int(record["meta_length"])])
+        metadata["text"] = blob[text_offset:text_offset + int(record["text_length"])].decode("utf-8")
+        return metadata
+
+    def __len__(self) -> int:
+        if not self._segments:
+            return 0
+        # Newest record per id, minus deleted ones
+        records = np.concatenate([records for _, records, _ in reversed(self._segments)])
+        _, first = np.unique(records["id_hash"], return_index=True)
+        return int(np.count_nonzero(records["text_length"][first] != DELETED))
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return self._find(chunk_id)[1] is not None
+
+    def _find(self, chunk_id: str):
+        """
+        Returns the blob and the live record of a chunk, or (None, None) if
+        the chunk is unknown or deleted.
+        """
+        segments = self._segments
+        blob = self._blob
+        if blob is None:
+            return None, None
+        for record in self._latest(segments, self._hash(chunk_id)):
+            if record["text_length"] == DELETED:
+                return None, None
+            meta_offset = int(record["meta_offset"])
+            # Guards against a 64-bit hash collision with another id
+            stored_id = json.loads(blob[meta_offset:meta_offset + int(record["meta_length"])]).get("id", chunk_id)
+            if stored_id == chunk_id:
+                return blob, record
+        return None, None
+
+    def text_view(self, chunk_id: str) -> Optional[memoryview]:
+        """
+        Returns the UTF-8 bytes of a chunk's text as a view into the mapped
+        blob, without copying or decoding them, or None if the chunk is
+        unknown. The view stays valid after later writes and refreshes.
+        """
+        blob, record = self._find(chunk_id)
+        if record is None:
+            return None
+        text_offset = int(record["text_offset"])
+        return memoryview(blob)[text_offset:text_offset + int(record["text_length"])]
+
+    def get(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the metadata of a chunk, including its 'text', or None if the
+        chunk is unknown. Unlike `text_view`, this copies and decodes the text.
+        """
+        blob, record = self._find(chunk_id)
+        if record is None:
+            return None
+        metadata = self._read(blob, record)
+        metadata.pop("id", None)
+        return metadata
+
+    def get_many(self, chunk_ids: Iterable[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Returns the metadata of several chunks, with None for unknown ids.
+        """
+        return [self.get(chunk_id) for chunk_id in chunk_ids]
+
+    def paper_chunk_ids(self, paper_id: str) -> List[str]:
+        """
+        Returns the ids of a paper's live chunks, in the order they were added.
+        """
+        segments = self._segments
+        blob = self._blob
+        if blob is None:
+            return []
+        paper_hash = self._hash(paper_id)
+        found = {}
+        for _, records, paper_rows in segments:
+            papers = records["paper_hash"][paper_rows]
+            start = int(np.searchsorted(papers, paper_hash, side="left"))
+            end = int(np.searchsorted(papers, paper_hash, side="right"))
+            for row in paper_rows[start:end]:
+                record = records[int(row)]
+                latest = next(self._latest(segments, int(record["id_hash"])))
+                # Skip chunks since replaced (possibly under another paper) or deleted
+                if latest["text_offset"] == record["text_offset"] and latest["text_length"] != DELETED:
+                    found[int(record["text_offset"])] = record
+        chunk_ids = []
+        for offset in sorted(found):
+            record = found[offset]
+            meta_offset = int(record["meta_offset"])
+            chunk_ids.append(json.loads(blob[meta_offset:meta_offset + int(record["meta_length"])]).get("id"))
+        return chunk_ids
+
+    def add_many(self, chunks: Iterable[Tuple[str, Dict[str, Any]]]):
+        """
+        Appends chunks given as (chunk_id, metadata) pairs, where metadata
+        holds the chunk 'text' and any other fields. Existing ids are replaced.
+        """
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            blob_path = os.path.join(self.path, self.BLOB_FILE)
+            records = {}
+            with open(blob_path, "ab") as blob:
+                offset = blob.tell()
+                for chunk_id, metadata in chunks:
+                    metadata = dict(metadata)
+                    text = (metadata.pop("text", None) or "").encode("utf-8")
+                    paper = self.paper_key(metadata)
+                    metadata["id"] = chunk_id
+                    meta = json.dumps(metadata, separators=(",", ":")).encode("utf-8")
+                    blob.write(text)
+                    blob.write(meta)
+                    # A later copy of the same id in one batch wins
+                    records[chunk_id] = (
+                        self._hash(chunk_id), self._hash(paper) if paper else 0,
+                        offset, offset + len(text), len(text), len(meta),
+                    )
+                    offset += len(text) + len(meta)
+                blob.flush()
+                os.fsync(blob.fileno())
+            # The index is written after the blob so a crash never leaves index
+            # records pointing past the end of the blob.
+            self._remap()
+            self._write_segment(list(records.values()))
+
+    def delete(self, chunk_ids: Iterable[str]):
+        """
+        Removes chunks. Their bytes stay in the blob.
+        """
+        with self._lock:
+            records = {chunk_id: (self._hash(chunk_id), 0, 0, 0, DELETED, 0) for chunk_id in chunk_ids}
+            self._write_segment(list(records.values()))
+
+    def _write_segment(self, records: List[Tuple]):
+        if not records:
+            return
+        records = np.array(records, dtype=RECORD)
+        records = records[np.argsort(records["id_hash"], kind="stable")]
+        number = max((segment[0] for segment in self._segments), default=0) + 1
+        self._save_segment(number, records)
+        self._segments.append((
+            number,
+            np.load(self._segment_path(number, "ids"), mmap_mode="r"),
+            np.load(self._segment_path(number, "papers"), mmap_mode="r"),
+        ))
+        self._merge_tail()
+        self._signature = self._stat_signature()
+
+    def _save_segment(self, number: int, records: np.ndarray):
+        """
+        Writes a segment's paper order, then its records, each atomically.
+        Readers only list the records file, so they never see half a segment.
+        """
+        paper_rows = np.lexsort((records["text_offset"], records["paper_hash"])).astype(np.int64)
+        for kind, array in (("papers", paper_rows), ("ids", records)):
+            path = self._segment_path(number, kind)
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+
+    def _merge_tail(self):
+        """
+        Merges the newest segment into the one before it while that one is no
+        more than twice its size, so each record is rewritten O(log n) times.
+        """
+        while len(self._segments) >= 2 and len(self._segments[-2][1]) <= 2 * len(self._segments[-1][1]):
+            (older_number, older, _), (newer_number, newer, _) = self._segments[-2:]
+            # Newest record per id; np.unique keeps the first occurrence
+            combined = np.concatenate([newer, older])
+            _, first = np.unique(combined["id_hash"], return_index=True)
+            merged = combined[first]
+            if len(self._segments) == 2:
+                # Nothing older is left for a deletion to hide
+                merged = merged[merged["text_length"] != DELETED]
+            number = newer_number + 1
+            self._save_segment(number, merged)
+            for old_number in (older_number, newer_number):
+                os.remove(self._segment_path(old_number, "ids"))
+                os.remove(self._segment_path(old_number, "papers"))
+            self._segments[-2:] = [(
+                number,
+                np.load(self._segment_path(number, "ids"), mmap_mode="r"),
+                np.load(self._segment_path(number, "papers"), mmap_mode="r"),
+            )]
+            if not len(merged):
+                # Everything was deleted; drop the empty segment
+                os.remove(self._segment_path(number, "ids"))
+                os.remove(self._segment_path(number, "papers"))
+                self._segments.pop()
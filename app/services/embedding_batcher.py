@@ -0,0 +1,71 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, List
+
+
+class EmbeddingBatcher:
+    """
+    Groups concurrent encode requests into batched forward passes.
+
+    Callers submit single texts and get a Future back. A background thread
+    takes the first waiting text, keeps collecting more for up to `window_ms`
+    milliseconds (or until `max_batch_size` texts are queued) and encodes them
+    with a single `model.encode` call, which is much cheaper per text than
+    encoding them one at a time.
+    """
+
+    def __init__(self, model: Any, window_ms: float = 3.0, max_batch_size: int = 32):
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Queues a text for encoding. The Future resolves to its embedding as a list of floats.
+        """
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str) -> List[float]:
+        """
+        Encodes a text, blocking until its batch has run.
+        """
+        return self.submit(text).result()
+
+    def _collect(self):
+        """
+        Waits for a first request, then gathers more until the window closes or the batch is full.
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Skip requests whose caller has already given up
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                embeddings = self.model.encode([text for text, _ in batch], batch_size=len(batch))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding.tolist())
@@ -0,0 +1,25 @@
+from typing import Any
+from app.config import settings
+
+
+def load_embedding_model(model_name: str) -> Any:
+    """
+    Loads the sentence embedding model with the backend selected by
+    `settings.EMBEDDING_BACKEND`: "torch" (SentenceTransformer) or "onnx"
+    (OnnxSentenceEncoder, which does not import torch). Both produce
+    compatible embeddings and expose `encode`.
+    """
+    backend = settings.EMBEDDING_BACKEND.lower()
+    if backend == "torch":
+        # Imported lazily: importing torch dominates startup time and memory
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend == "onnx":
+        from app.services.onnx_encoder import OnnxSentenceEncoder
+        return OnnxSentenceEncoder(
+            model_name,
+            model_file=settings.ONNX_MODEL_FILE,
+            model_dir=settings.ONNX_MODEL_DIR,
+            num_threads=settings.ONNX_NUM_THREADS,
+        )
+    raise ValueError(f"Unknown embedding backend: '{settings.EMBEDDING_BACKEND}'")
@@ -0,0 +1,405 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import pandas as pd
+from tqdm import tqdm
+from app.config import settings
+from app.services.rag_service import RAGService
+from app.services.vector_store import create_vector_store
+from app.services.document_store import DocumentStore
+from app.services.cache import InvalidationLog
+from app.services.embedding_model import load_embedding_model
+
+
+class IngestManifest:
+    """
+    Records the content hash of every ingested chunk in a SQLite file, so
+    re-ingestion can skip unchanged chunks and find removed ones.
+
+    Each ingestion run gets a run number; every chunk and paper seen in the
+    run is stamped with it, which leaves the stale rows easy to select.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, paper_id TEXT, title TEXT, hash TEXT, run INTEGER);
+            CREATE INDEX IF NOT EXISTS chunks_paper ON chunks (paper_id);
+            CREATE TABLE IF NOT EXISTS papers (paper_id TEXT PRIMARY KEY, run INTEGER);
+            """
+        )
+        self._conn.commit()
+        self.run = (self._conn.execute("SELECT MAX(run) FROM chunks").fetchone()[0] or 0) + 1
+
+    def is_unchanged(self, chunk_id: str, content_hash: str) -> bool:
+        """
+        Returns True if the chunk was ingested before with the same content.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT hash FROM chunks WHERE id = ?", (chunk_id,)).fetchone()
+        return row is not None and row[0] == content_hash
+
+    def mark_seen(self, chunk_ids: Iterable[str], paper_ids: Iterable[str]):
+        """
+        Stamps unchanged chunks, and the papers they belong to, with the current run.
+        """
+        with self._lock:
+            self._conn.executemany("UPDATE chunks SET run = ? WHERE id = ?", [(self.run, i) for i in chunk_ids])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO papers (paper_id, run) VALUES (?, ?)", [(p, self.run) for p in set(paper_ids)]
+            )
+            self._conn.commit()
+
+    def record(self, rows: Iterable[Tuple[str, str, str, str]]):
+        """
+        Stores (chunk_id, paper_id, title, hash) rows for chunks upserted in this run.
+        """
+        rows = list(rows)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, paper_id, title, hash, run) VALUES (?, ?, ?, ?, ?)",
+                [row + (self.run,) for row in rows],
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO papers (paper_id, run) VALUES (?, ?)",
+                [(p, self.run) for p in {row[1] for row in rows}],
+            )
+            self._conn.commit()
+
+    def stale_chunks(self, prune: bool) -> List[Tuple[str, str, str]]:
+        """
+        Returns (chunk_id, paper_id, title) of chunks not seen in this run.
+
+        Args:
+            prune: If True the run covered the whole corpus, so chunks of papers
+                missing from it are stale too. Otherwise only chunks that
+                disappeared from papers seen in this run are.
+        """
+        with self._lock:
+            if prune:
+                query = "SELECT id, paper_id, title FROM chunks WHERE run != ?"
+            else:
+                query = (
+                    "SELECT c.id, c.paper_id, c.title FROM chunks c JOIN papers p ON c.paper_id = p.paper_id "
+                    "WHERE p.run = ? AND c.run != p.run"
+                )
+            return self._conn.execute(query, (self.run,)).fetchall()
+
+    def remove(self, chunk_ids: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in chunk_ids])
+            self._conn.execute("DELETE FROM papers WHERE paper_id NOT IN (SELECT DISTINCT paper_id FROM chunks)")
+            self._conn.commit()
+
+
+class IngestionService:
+    """
+    Builds the research-papers index from paper files.
+
+    Papers are streamed from CSV or JSONL in fixed-size row chunks, split into
+    overlapping passages, encoded in batches with the same SentenceTransformer
+    the RAG service queries with, and upserted concurrently. Memory use is
+    bounded by the read chunk size, the encode batch size and the number of
+    upserts in flight, not by the size of the corpus.
+    """
+
+    def __init__(self, passage_words: int = 200, overlap_words: int = 40,
+                 encode_batch_size: int = 256, upsert_batch_size: Optional[int] = None,
+                 upsert_workers: int = 8, incremental: bool = False):
+        """
+        Initializes the ingestion pipeline.
+
+        Args:
+            passage_words: Number of words per passage.
+            overlap_words: Number of words shared by consecutive passages.
+            encode_batch_size: Number of passages per embedding batch.
+            upsert_batch_size: Number of vectors per upsert request. Defaults to
+                100 for Pinecone and 1000 for the local index, whose appends
+                cost time proportional to the batch plus a few fsyncs, so
+                larger batches only keep more vectors in memory.
+            upsert_workers: Number of upserts run in parallel.
+            incremental: Only embed and upsert chunks whose content changed
+                since the last run, and delete chunks that were removed, using
+                the manifest at INGEST_MANIFEST_PATH.
+        """
+        if overlap_words >= passage_words:
+            raise ValueError("overlap_words must be smaller than passage_words.")
+        self.passage_words = passage_words
+        self.overlap_words = overlap_words
+        self.encode_batch_size = encode_batch_size
+        if upsert_batch_size is None:
+            upsert_batch_size = 100 if settings.VECTOR_BACKEND.lower() == "pinecone" else 1000
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_workers = upsert_workers
+
+        print(f"Loading sentence transformer model: '{RAGService.MODEL_NAME}' ({settings.EMBEDDING_BACKEND})...")
+        self.model = load_embedding_model(RAGService.MODEL_NAME)
+        self.index = create_vector_store(RAGService.INDEX_NAME)
+        # Keep a local copy of the chunks when results are hydrated locally
+        self.documents = None
+        if settings.RETRIEVAL_HYDRATE_LOCALLY:
+            self.documents = DocumentStore(settings.DOCUMENT_STORE_PATH)
+
+        self.manifest = IngestManifest(settings.INGEST_MANIFEST_PATH) if incremental else None
+        self.invalidation_log = None
+        if settings.INVALIDATION_LOG_PATH:
+            self.invalidation_log = InvalidationLog(settings.INVALIDATION_LOG_PATH)
+        # Ids and titles of papers changed in this run, for cache invalidation
+        self.changed_papers: Set[str] = set()
+
+    @staticmethod
+    def read_papers(path: str, chunksize: int = 1000) -> Iterator[pd.DataFrame]:
+        """
+        Streams a CSV or JSONL file as DataFrames of at most `chunksize` rows.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension in (".jsonl", ".ndjson", ".json"):
+            reader = pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+        elif extension == ".csv":
+            reader = pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False)
+        else:
+            raise ValueError(f"Unsupported paper file type: '{extension}'")
+        with reader:
+            yield from reader
+
+    def split_passages(self, text: str) -> List[str]:
+        """
+        Splits text into passages of `passage_words` words, each overlapping
+        the previous one by `overlap_words` words.
+        """
+        words = text.split()
+        if not words:
+            return []
+        step = self.passage_words - self.overlap_words
+        passages = []
+        for start in range(0, len(words), step):
+            passages.append(" ".join(words[start:start + self.passage_words]))
+            if start + self.passage_words >= len(words):
+                break
+        return passages
+
+    @staticmethod
+    def _field(row: Dict[str, Any], column: str, default: str = "") -> str:
+        """
+        Returns a row value as a string, treating missing and NaN values as `default`.
+        """
+        value = row.get(column)
+        if value is None or (isinstance(value, float) and pd.isna(value)) or value == "":
+            return default
+        # Integer columns with gaps are read as floats; keep ids like "12", not "12.0"
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    @classmethod
+    def paper_id(cls, row: Dict[str, Any], id_column: str, title_column: str) -> str:
+        """
+        Returns a stable id for a paper: its id column, or a hash of its title.
+        """
+        value = cls._field(row, id_column)
+        if value:
+            return value
+        title = cls._field(row, title_column)
+        return hashlib.sha1(title.encode("utf-8")).hexdigest()[:16]
+
+    def iter_passages(self, path: str, text_column: str = "text", title_column: str = "title",
+                      authors_column: str = "authors", id_column: str = "id",
+                      chunksize: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Yields {"id", "text", "metadata"} passages for every paper in a file.
+        """
+        for frame in self.read_papers(path, chunksize):
+            for row in frame.to_dict(orient="records"):
+                text = self._field(row, text_column)
+                paper_id = self.paper_id(row, id_column, title_column)
+                metadata = {
+                    "paper_id": paper_id,
+                    "title": self._field(row, title_column),
+                    "authors": self._field(row, authors_column, "N/A"),
+                }
+                for i, passage in enumerate(self.split_passages(text)):
+                    chunk_metadata = dict(metadata, chunk=i)
+                    yield {
+                        "id": f"{paper_id}-{i}",
+                        "text": passage,
+                        "metadata": chunk_metadata,
+                        "hash": self.content_hash(passage, chunk_metadata),
+                    }
+
+    @staticmethod
+    def content_hash(text: str, metadata: Dict[str, Any]) -> str:
+        """
+        Returns a hash of everything stored for a chunk.
+        """
+        digest = hashlib.sha1(text.encode("utf-8"))
+        digest.update(json.dumps(metadata, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _changed_passages(self, passages: Iterator[Dict[str, Any]], batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Filters out passages whose content is unchanged since they were last
+        ingested, stamping them as seen in the manifest.
+        """
+        unchanged_ids, unchanged_papers = [], []
+        skipped = 0
+        for passage in passages:
+            if self.manifest.is_unchanged(passage["id"], passage["hash"]):
+                unchanged_ids.append(passage["id"])
+                unchanged_papers.append(passage["metadata"]["paper_id"])
+                if len(unchanged_ids) >= batch_size:
+                    self.manifest.mark_seen(unchanged_ids, unchanged_papers)
+                    skipped += len(unchanged_ids)
+                    unchanged_ids, unchanged_papers = [], []
+                continue
+            self.changed_papers.update((passage["metadata"]["paper_id"], passage["metadata"]["title"]))
+            yield passage
+        if unchanged_ids:
+            self.manifest.mark_seen(unchanged_ids, unchanged_papers)
+            skipped += len(unchanged_ids)
+        print(f"Skipped {skipped} unchanged passages.")
+
+    def _batches(self, passages: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+        batch = []
+        for passage in passages:
+            batch.append(passage)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def encode_and_upsert(self, passages: Iterator[Dict[str, Any]], total: Optional[int] = None) -> int:
+        """
+        Encodes passages in batches and upserts them with bounded concurrency.
+
+        Returns:
+            The number of passages upserted.
+        """
+        count = 0
+        pending = set()
+        max_pending = self.upsert_workers * 2
+        upsert_buffer = []
+
+        def submit(executor, vectors):
+            nonlocal pending
+            # Bound the number of batches held in memory
+            while len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(executor.submit(self._upsert, vectors))
+
+        with ThreadPoolExecutor(max_workers=self.upsert_workers, thread_name_prefix="upsert") as executor, \
+                tqdm(total=total, unit="passages", desc="Ingesting") as progress:
+            for batch in self._batches(passages, self.encode_batch_size):
+                embeddings = self.model.encode(
+                    [passage["text"] for passage in batch],
+                    batch_size=self.encode_batch_size,
+                    show_progress_bar=False,
+                )
+                if self.documents is not None:
+                    self.documents.add_many(
+                        (passage["id"], dict(passage["metadata"], text=passage["text"])) for passage in batch
+                    )
+                for passage, embedding in zip(batch, embeddings):
+                    metadata = dict(passage["metadata"])
+                    if self.documents is None:
+                        metadata["text"] = passage["text"]
+                    upsert_buffer.append({
+                        "id": passage["id"],
+                        "values": embedding.tolist(),
+                        "metadata": metadata,
+                        "hash": passage["hash"],
+                    })
+                    if len(upsert_buffer) >= self.upsert_batch_size:
+                        submit(executor, upsert_buffer)
+                        upsert_buffer = []
+                count += len(batch)
+                progress.update(len(batch))
+
+            if upsert_buffer:
+                submit(executor, upsert_buffer)
+            for future in pending:
+                future.result()
+        return count
+
+    def _upsert(self, vectors: List[Dict[str, Any]]):
+        """
+        Upserts a batch of vectors, then records their hashes in the manifest so
+        a failed upsert is retried on the next run.
+        """
+        hashes = [vector.pop("hash") for vector in vectors]
+        self.index.upsert(vectors)
+        if self.manifest is not None:
+            self.manifest.record(
+                (vector["id"], vector["metadata"]["paper_id"], vector["metadata"]["title"], content_hash)
+                for vector, content_hash in zip(vectors, hashes)
+            )
+
+    def remove_stale(self, prune: bool = False, batch_size: int = 1000) -> int:
+        """
+        Deletes chunks that were not seen in this incremental run from the
+        index, the document store and the manifest.
+
+        Args:
+            prune: The run covered the whole corpus, so papers missing from it
+                are deleted too.
+
+        Returns:
+            The number of chunks deleted.
+        """
+        stale = self.manifest.stale_chunks(prune)
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            chunk_ids = [chunk_id for chunk_id, _, _ in batch]
+            self.index.delete(chunk_ids)
+            if self.documents is not None:
+                self.documents.delete(chunk_ids)
+            self.manifest.remove(chunk_ids)
+            for _, paper_id, title in batch:
+                self.changed_papers.update(p for p in (paper_id, title) if p)
+        if stale:
+            print(f"Deleted {len(stale)} stale passages.")
+        return len(stale)
+
+    def ingest(self, paths: List[str], text_column: str = "text", title_column: str = "title",
+               authors_column: str = "authors", id_column: str = "id", chunksize: int = 1000,
+               prune: bool = False) -> int:
+        """
+        Ingests every paper in one or more CSV or JSONL files.
+
+        In incremental mode unchanged chunks are skipped, chunks removed from
+        the papers (or, with `prune`, from the corpus) are deleted, and the
+        changed papers are written to the invalidation log so running servers
+        drop their cached results for them.
+
+        Returns:
+            The number of passages upserted.
+        """
+        self.changed_papers = set()
+        count = 0
+        for path in paths:
+            print(f"Ingesting papers from '{path}'...")
+            passages = self.iter_passages(path, text_column, title_column, authors_column, id_column, chunksize)
+            if self.manifest is not None:
+                passages = self._changed_passages(passages)
+            count += self.encode_and_upsert(passages)
+        print(f"Ingested {count} passages into '{RAGService.INDEX_NAME}'.")
+
+        if self.manifest is not None:
+            self.remove_stale(prune)
+            if self.invalidation_log is not None:
+                self.invalidation_log.append(self.changed_papers)
+        elif self.invalidation_log is not None and count:
+            # A full re-ingest may have changed anything; "*" clears whole caches
+            self.invalidation_log.append(["*"])
+        return count
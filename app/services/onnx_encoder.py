@@ -0,0 +1,96 @@
+import os
+import numpy as np
+from typing import List, Union
+
+
+class OnnxSentenceEncoder:
+    """
+    A torch-free CPU encoder for all-MiniLM-L6-v2 using ONNX Runtime.
+
+    It reproduces the sentence-transformers pipeline of that model (WordPiece
+    tokenization truncated to 256 tokens, mean pooling over the attention mask,
+    L2 normalization), so its embeddings are compatible with an index built by
+    `SentenceTransformer`. The int8-quantized export can be used for lower
+    latency and memory at a small cost in parity.
+
+    `encode` mirrors the subset of `SentenceTransformer.encode` this app uses.
+    """
+
+    MAX_SEQ_LENGTH = 256
+
+    def __init__(self, model_name: str, model_file: str = "onnx/model.onnx",
+                 model_dir: str = None, num_threads: int = 0):
+        """
+        Args:
+            model_name: Hugging Face model id, used to download the export when
+                `model_dir` is not given.
+            model_file: Path of the ONNX file within the model directory, e.g.
+                "onnx/model_qint8_avx512.onnx" for the quantized weights.
+            model_dir: Local directory holding `tokenizer.json` and `model_file`.
+            num_threads: ONNX Runtime intra-op threads; 0 lets it decide.
+        """
+        # Imported here so the default PyTorch backend does not need these packages.
+        from tokenizers import Tokenizer
+
+        if model_dir:
+            tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+            model_path = os.path.join(model_dir, model_file)
+        else:
+            from huggingface_hub import hf_hub_download
+            repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+            tokenizer_path = hf_hub_download(repo_id, "tokenizer.json")
+            model_path = hf_hub_download(repo_id, model_file)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=self.MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self._create_session()
+
+    def _create_session(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def after_fork(self):
+        """
+        Re-creates the inference session in a forked worker. A session and its
+        thread pool created before fork are not safe to use in the child; the
+        weight file itself stays shared through the page cache.
+        """
+        self._create_session()
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+        # Mean pooling over real (non-padding) tokens
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        Encodes one text (returning a 1-D array) or a list of texts (a 2-D array).
+        Extra keyword arguments of `SentenceTransformer.encode` are ignored.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        batches = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        embeddings = np.concatenate(batches)
+        return embeddings[0] if single else embeddings
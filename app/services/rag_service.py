@@ -1,28 +1,80 @@
 import os
-from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Tuple
+import json
+import time
+import asyncio
+import hashlib
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Dict, Optional, Tuple
 from app.config import settings
+from app.services.cache import LRUCache, DiskCache, InvalidationLog, normalize_query
+from app.services.vector_store import create_vector_store
+from app.services.document_store import DocumentStore
+from app.services.context_builder import deduplicate_chunks, pack_context
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_model import load_embedding_model
 
 class RAGService:
     """
-    A Retrieval-Augmented Generation (RAG) service class that connects to Pinecone
+    A Retrieval-Augmented Generation (RAG) service class that connects to a vector
+    store (Pinecone, or a local in-process index selected by `VECTOR_BACKEND`)
     and uses a sentence transformer to retrieve relevant documents.
-    This class is updated to use the modern pinecone-client v3.x syntax.
     """
 
-    def __init__(self):
+    # Shared with the ingestion pipeline, which must embed with the same model
+    INDEX_NAME = "research-papers"
+    MODEL_NAME = "all-MiniLM-L6-v2"
+
+    def __init__(self, preload: bool = False):
         """
         Initializes the RAGService.
 
         Args:
-            pinecone_api_key (str): Your Pinecone API key.
-            pinecone_environment (str): The Pinecone environment for your index (e.g., 'us-east-1').
+            preload (bool): Build the service in a pre-fork master process. No
+                threads are started and the model is not exercised until
+                `after_fork` runs in each worker.
         """
-        if not settings.PINECONE_API_KEY:
+        self.preload = preload
+        if settings.VECTOR_BACKEND.lower() == "pinecone" and not settings.PINECONE_API_KEY:
             raise ValueError("Pinecone API key and environment must be provided.")
             
         self.pinecone_api_key = settings.PINECONE_API_KEY
+
+        # Bounded pool for the CPU-bound encode and the blocking Pinecone call,
+        # used by `aquery` to keep them off the event loop.
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.BLOCKING_EXECUTOR_WORKERS,
+            thread_name_prefix="rag",
+        )
+
+        # Query embeddings are cached in memory, and optionally on disk, keyed
+        # by the normalized query text.
+        self.embedding_cache = LRUCache(
+            max_size=settings.EMBEDDING_CACHE_SIZE,
+            ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+        )
+        self.embedding_disk_cache = None
+        if settings.EMBEDDING_CACHE_PATH:
+            self.embedding_disk_cache = DiskCache(
+                settings.EMBEDDING_CACHE_PATH,
+                ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            )
+
+        # Processed retrieval results, keyed by the query embedding and the
+        # retrieval options. Cleared with `invalidate_retrieval_cache`
+        # whenever the index is re-ingested.
+        self.retrieval_cache = LRUCache(
+            max_size=settings.RETRIEVAL_CACHE_SIZE,
+            ttl_seconds=settings.RETRIEVAL_CACHE_TTL_SECONDS,
+        )
+        # Papers changed by the ingestion job, possibly in another process
+        self.invalidation_log = None
+        if settings.INVALIDATION_LOG_PATH:
+            self.invalidation_log = InvalidationLog(settings.INVALIDATION_LOG_PATH)
+        # Callbacks told which papers changed (["*"] for everything), so caches
+        # built on retrieval results elsewhere can be invalidated too
+        self.invalidation_listeners = []
         
         # The _warm_up function is called during class initialization
         self._warm_up()
@@ -30,103 +82,563 @@ class RAGService:
     def _warm_up(self):
         """
         Initializes the necessary components for the RAG service:
-        - Connects to the Pinecone index.
+        - Connects to the vector index.
         - Loads the sentence transformer model.
         """
         print("Warming up RAG Service...")
+        # Seconds spent in each warm-up phase, reported by the readiness probe
+        self.warmup_timings = {}
         
-        # --- Configuration for Pinecone and Model ---
-        self.index_name = "research-papers"
-        self.model_name = "all-MiniLM-L6-v2"
+        # --- Configuration for the Index and Model ---
+        self.index_name = self.INDEX_NAME
+        self.model_name = self.MODEL_NAME
 
-        # --- Initialize Pinecone (Updated) ---
-        print(f"Connecting to Pinecone index: '{self.index_name}'...")
+        # --- Initialize the Vector Index ---
+        print(f"Connecting to {settings.VECTOR_BACKEND} index: '{self.index_name}'...")
+        started = time.perf_counter()
         try:
-            # The modern client is initialized with the api_key.
-            # The environment is no longer needed here for serverless indexes,
-            # but passing it ensures compatibility with older, pod-based indexes.
-            pc = Pinecone(api_key=self.pinecone_api_key)
-            
-            # Get a handle to the specific index
-            self.index = pc.Index(self.index_name)
+            self.index = create_vector_store(self.index_name)
             
             # A quick check to ensure the connection is valid
-            print("Pinecone index stats:", self.index.describe_index_stats())
+            print("Index stats:", self.index.describe_index_stats())
         except Exception as e:
-            print(f"Error connecting to Pinecone: {e}")
+            print(f"Error connecting to the vector index: {e}")
             raise
+        self.warmup_timings["index"] = time.perf_counter() - started
+
+        # --- Open the Local Document Store ---
+        # With RETRIEVAL_HYDRATE_LOCALLY the index only returns ids and scores,
+        # and chunk text and metadata are read from this store instead.
+        self.documents = None
+        if settings.RETRIEVAL_HYDRATE_LOCALLY:
+            print(f"Opening document store: '{settings.DOCUMENT_STORE_PATH}'...")
+            started = time.perf_counter()
+            self.documents = DocumentStore(settings.DOCUMENT_STORE_PATH)
+            self.warmup_timings["document_store"] = time.perf_counter() - started
+            print(f"Document store holds {len(self.documents)} chunks.")
 
         # --- Initialize Sentence Transformer Model ---
-        print(f"Loading sentence transformer model: '{self.model_name}'...")
+        print(f"Loading sentence transformer model: '{self.model_name}' ({settings.EMBEDDING_BACKEND})...")
+        started = time.perf_counter()
         try:
-            self.model = SentenceTransformer(self.model_name)
-            print("Model loaded successfully.")
+            self.model = load_embedding_model(self.model_name)
+            self.batcher = None
+            if not self.preload:
+                self._start_model_workers()
+            self.warmup_timings["model"] = time.perf_counter() - started
+            print(f"Model loaded successfully in {self.warmup_timings['model']:.2f}s.")
         except Exception as e:
             print(f"Error loading sentence transformer model: {e}")
             raise
             
         print("RAG Service is ready.")
 
-    def query(self, user_query: str, top_k: int = 100) -> Tuple[List[str], List[Dict[str, str]]]:
+    def _start_model_workers(self):
         """
-        Searches the Pinecone index, processes the results, and returns a combined
-        list of texts and a list of unique source papers.
+        Warms the model up and starts the micro-batching thread.
+        """
+        # Run one encode so the first request does not pay for lazy initialization
+        self.model.encode("warm up")
+        # Concurrent query encodes are grouped into batched forward passes
+        if settings.EMBEDDING_MICRO_BATCHING:
+            self.batcher = EmbeddingBatcher(
+                self.model,
+                window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+                max_batch_size=settings.EMBEDDING_MAX_BATCH_SIZE,
+            )
+
+    def after_fork(self):
+        """
+        Re-creates the per-process parts of a service built before fork: thread
+        pools, network clients, SQLite connections and the ONNX Runtime
+        session, none of which survive a fork. The model weights and
+        memory-mapped indexes stay shared with the master copy-on-write.
+        """
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.BLOCKING_EXECUTOR_WORKERS,
+            thread_name_prefix="rag",
+        )
+        if self.embedding_disk_cache is not None:
+            self.embedding_disk_cache = DiskCache(
+                settings.EMBEDDING_CACHE_PATH,
+                ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            )
+        if settings.VECTOR_BACKEND.lower() == "pinecone":
+            self.index = create_vector_store(self.index_name)
+        # Backends holding native sessions (ONNX Runtime) rebuild them per worker
+        model_after_fork = getattr(self.model, "after_fork", None)
+        if model_after_fork is not None:
+            model_after_fork()
+        self.preload = False
+        self._start_model_workers()
+
+    def _cached_embedding(self, key: str) -> Optional[List[float]]:
+        """
+        Looks up a normalized query in the memory and disk embedding caches.
+        """
+        embedding = self.embedding_cache.get(key)
+        if embedding is not None:
+            return embedding
+
+        if self.embedding_disk_cache is not None:
+            embedding = self.embedding_disk_cache.get(key)
+            if embedding is not None:
+                self.embedding_cache.set(key, embedding)
+                return embedding
+        return None
+
+    def _store_embedding(self, key: str, embedding: List[float]):
+        self.embedding_cache.set(key, embedding)
+        if self.embedding_disk_cache is not None:
+            try:
+                self.embedding_disk_cache.set(key, embedding)
+            except Exception as e:
+                # The embedding is still good; only persisting it failed
+                print(f"Error storing the embedding in the disk cache: {e}")
+
+    def embed_query(self, user_query: str) -> List[float]:
+        """
+        Returns the embedding of a query, using the embedding cache when possible.
 
         Args:
             user_query (str): The query text from the user.
-            top_k (int, optional): The number of results to retrieve. Defaults to 100.
 
         Returns:
-            Tuple[List[str], List[Dict[str, str]]]: 
-                A tuple containing:
-                - A list of the retrieved text chunks.
-                - A list of unique source papers, each as a dictionary with 'title' and 'authors'.
+            List[float]: The query embedding.
+        """
+        key = normalize_query(user_query)
+        embedding = self._cached_embedding(key)
+        if embedding is not None:
+            return embedding
+
+        if self.batcher is not None:
+            embedding = self.batcher.encode(key)
+        else:
+            embedding = self.model.encode(key).tolist()
+        self._store_embedding(key, embedding)
+        return embedding
+
+    async def _acached_embeddings(self, keys: List[str]) -> Dict[str, Optional[List[float]]]:
+        """
+        Looks up normalized queries in the memory cache, then the misses in the
+        disk cache on the executor, so SQLite is never read on the event loop.
+        """
+        found = {key: self.embedding_cache.get(key) for key in keys}
+        missing = [key for key, embedding in found.items() if embedding is None]
+        if missing and self.embedding_disk_cache is not None:
+            loop = asyncio.get_running_loop()
+            on_disk = await loop.run_in_executor(
+                self.executor, lambda: [self.embedding_disk_cache.get(key) for key in missing]
+            )
+            for key, embedding in zip(missing, on_disk):
+                if embedding is not None:
+                    self.embedding_cache.set(key, embedding)
+                    found[key] = embedding
+        return found
+
+    async def _astore_embeddings(self, embeddings: Dict[str, List[float]]):
+        """
+        Caches new embeddings in memory, and on disk from the executor.
+        """
+        for key, embedding in embeddings.items():
+            self.embedding_cache.set(key, embedding)
+        if self.embedding_disk_cache is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(
+                    self.executor,
+                    lambda: [self.embedding_disk_cache.set(key, embedding) for key, embedding in embeddings.items()]
+                )
+            except Exception as e:
+                print(f"Error storing embeddings in the disk cache: {e}")
+
+    async def aembed_query(self, user_query: str) -> List[float]:
+        """
+        Async variant of `embed_query`. With micro-batching enabled the caller
+        waits on the batcher without holding an executor thread, so concurrent
+        queries can share one forward pass.
+        """
+        key = normalize_query(user_query)
+        embedding = (await self._acached_embeddings([key]))[key]
+        if embedding is not None:
+            return embedding
+
+        if self.batcher is not None:
+            embedding = await asyncio.wrap_future(self.batcher.submit(key))
+        else:
+            loop = asyncio.get_running_loop()
+            embedding = await loop.run_in_executor(self.executor, lambda: self.model.encode(key).tolist())
+        await self._astore_embeddings({key: embedding})
+        return embedding
+
+    async def aembed_queries(self, user_queries: List[str]) -> List[List[float]]:
+        """
+        Embeds many queries at once: cached ones are looked up and the rest
+        are encoded together in a single `model.encode` batch.
+
+        Args:
+            user_queries (List[str]): The query texts.
+
+        Returns:
+            List[List[float]]: One embedding per query, in order.
+        """
+        keys = [normalize_query(user_query) for user_query in user_queries]
+        embeddings = await self._acached_embeddings(keys)
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+        if missing:
+            print(f"Encoding {len(missing)} queries in one batch...")
+            loop = asyncio.get_running_loop()
+            encoded = await loop.run_in_executor(
+                self.executor,
+                lambda: self.model.encode(missing, batch_size=settings.EMBEDDING_MAX_BATCH_SIZE)
+            )
+            new_embeddings = {key: embedding.tolist() for key, embedding in zip(missing, encoded)}
+            await self._astore_embeddings(new_embeddings)
+            embeddings.update(new_embeddings)
+        return [embeddings[key] for key in keys]
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns hit/miss counters for the service's caches.
+        """
+        stats = {
+            "embedding": self.embedding_cache.stats(),
+            "retrieval": self.retrieval_cache.stats(),
+        }
+        if self.embedding_disk_cache is not None:
+            stats["embedding_disk"] = self.embedding_disk_cache.stats()
+        return stats
+
+    def invalidate_retrieval_cache(self):
+        """
+        Drops all cached retrieval results. Call this after the index has been
+        re-ingested so stale chunks are not served.
+        """
+        print("Invalidating retrieval cache.")
+        self.retrieval_cache.clear()
+        self._notify_invalidation(["*"])
+
+    def invalidate_papers(self, papers: List[str]) -> int:
+        """
+        Drops cached retrieval results that contain chunks of the given papers.
+
+        Args:
+            papers (List[str]): Paper ids or titles.
+
+        Returns:
+            int: The number of cache entries removed.
+        """
+        papers = set(papers)
+        removed = self.retrieval_cache.invalidate_where(
+            lambda chunks: any(
+                chunk.get("paper_id") in papers or chunk.get("title") in papers for chunk in chunks
+            )
+        )
+        if removed:
+            print(f"Invalidated {removed} cached retrieval results for {len(papers)} papers.")
+        self._notify_invalidation(sorted(papers))
+        return removed
+
+    def add_invalidation_listener(self, callback: Callable[[List[str]], Any]):
+        """
+        Registers a callback that is called with the changed papers whenever
+        cached retrieval results are invalidated, or with ["*"] when all are.
+        """
+        self.invalidation_listeners.append(callback)
+
+    def _notify_invalidation(self, papers: List[str]):
+        for callback in self.invalidation_listeners:
+            try:
+                callback(papers)
+            except Exception as e:
+                print(f"Error in cache invalidation listener: {e}")
+
+    def _refresh_stores(self):
+        """
+        Picks up chunks the ingestion job has written from another process, so
+        new ids returned by the index can be hydrated. Each store only checks
+        its files' sizes unless they changed. The document store goes first,
+        since ingestion writes a chunk's document before its vector.
+        """
+        if self.documents is not None and self.documents.refresh():
+            print(f"Document store reloaded; it holds {len(self.documents)} chunks.")
+        if self.index.refresh():
+            print("Vector index reloaded:", self.index.describe_index_stats())
+
+    def _apply_invalidations(self):
+        """
+        Reloads the local stores if they changed on disk, then applies paper
+        invalidations recorded by the ingestion job since the last check.
+        """
+        self._refresh_stores()
+        if self.invalidation_log is None:
+            return
+        papers = self.invalidation_log.read_new()
+        if "*" in papers:
+            self.invalidate_retrieval_cache()
+        elif papers:
+            self.invalidate_papers(papers)
+
+    @staticmethod
+    def _retrieval_cache_key(embedding: List[float], top_k: int, filter: Optional[Dict[str, Any]],
+                             min_score: float, adaptive: bool) -> str:
+        """
+        Builds a compact cache key from the query embedding and retrieval options.
+        """
+        digest = hashlib.sha1(json.dumps(embedding).encode("utf-8"))
+        digest.update(f"|{top_k}|{min_score}|{adaptive}|".encode("utf-8"))
+        digest.update(json.dumps(filter, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _knee_cutoff(scores: List[float], min_results: int) -> int:
+        """
+        Returns how many of the (descending) scores to keep, cutting where the
+        score curve bends from a steep drop into its long tail.
+
+        This is the "Kneedle" heuristic: with both axes scaled to [0, 1], the
+        knee is the point furthest below the straight line joining the first and
+        last scores, and the tail starts there. Curves without a pronounced knee
+        are kept whole.
+        """
+        n = len(scores)
+        if n <= min_results:
+            return n
+        highest, lowest = scores[0], scores[-1]
+        if highest - lowest <= 1e-6:
+            return n
+        best_index, best_distance = n, 0.1
+        for i, score in enumerate(scores):
+            x = i / (n - 1)
+            y = (score - lowest) / (highest - lowest)
+            distance = (1 - x) - y
+            if distance > best_distance:
+                best_index, best_distance = i, distance
+        return max(min_results, best_index)
+
+    def search(self, user_query: str, top_k: int = 100, filter: Optional[Dict[str, Any]] = None,
+               min_score: Optional[float] = None, adaptive: Optional[bool] = None,
+               query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Searches the vector index and returns the retrieved chunks with their scores.
+
+        Args:
+            user_query (str): The query text from the user.
+            top_k (int, optional): The maximum number of results to retrieve. Defaults to 100.
+            filter (Dict[str, Any], optional): Pinecone-style metadata filter. Defaults to None.
+            min_score (float, optional): Drop chunks scoring below this similarity.
+                Defaults to `RETRIEVAL_MIN_SCORE`.
+            adaptive (bool, optional): Stop at the knee of the score curve instead
+                of always returning `top_k` chunks. Defaults to `RETRIEVAL_ADAPTIVE_TOP_K`.
+            query_embedding (List[float], optional): The query's embedding, if
+                already computed.
+
+        Returns:
+            List[Dict[str, Any]]: Chunks in descending score order, each with
+                'id', 'score', 'paper_id', 'text', 'title' and 'authors'.
         """
         if not user_query:
             print("Warning: Query is empty. Returning no results.")
-            return [], []
+            return []
+
+        if min_score is None:
+            min_score = settings.RETRIEVAL_MIN_SCORE
+        if adaptive is None:
+            adaptive = settings.RETRIEVAL_ADAPTIVE_TOP_K
             
         print(f"Received query: '{user_query}'")
         
         try:
+            self._apply_invalidations()
+
             # Create the vector embedding for the user's query
-            query_embedding = self.model.encode(user_query).tolist()
+            if query_embedding is None:
+                query_embedding = self.embed_query(user_query)
+
+            cache_key = self._retrieval_cache_key(query_embedding, top_k, filter, min_score, adaptive)
+            cached = self.retrieval_cache.get(cache_key)
+            if cached is not None:
+                print("Retrieval cache hit.")
+                return [dict(chunk) for chunk in cached]
             
-            # Query Pinecone to get the most similar document chunks
-            print(f"Querying Pinecone index for top {top_k} results...")
+            # Query the index to get the most similar document chunks
+            print(f"Querying index for top {top_k} results...")
             results = self.index.query(
                 vector=query_embedding,
                 top_k=top_k,
-                include_metadata=True
+                filter=filter,
+                # Metadata is hydrated locally when a document store is configured
+                include_metadata=self.documents is None,
             )
             
             matches = results.get('matches', [])
             print(f"Found {len(matches)} matches.")
-            
-            # Process the results to separate text from sources
-            text_list = []
-            source_papers = []
-            seen_papers = set() # To track unique papers
 
+            # Low-similarity chunks only pad the prompt
+            matches = [match for match in matches if (match.get('score') or 0.0) >= min_score]
+
+            if adaptive and matches:
+                cutoff = self._knee_cutoff(
+                    [match.get('score') or 0.0 for match in matches],
+                    settings.RETRIEVAL_MIN_RESULTS,
+                )
+                if cutoff < len(matches):
+                    print(f"Score knee found; keeping {cutoff} of {len(matches)} matches.")
+                matches = matches[:cutoff]
+
+            if self.documents is not None:
+                matches = self._hydrate(matches)
+
+            # Collapse exact and near-duplicate chunks (e.g. overlapping
+            # passages of the same paper) before they reach a prompt
+            if settings.CHUNK_DEDUP_ENABLED and matches:
+                kept = deduplicate_chunks(
+                    [(match.get('metadata') or {}).get('text') for match in matches],
+                    similarity_threshold=settings.CHUNK_DEDUP_THRESHOLD,
+                )
+                if len(kept) < len(matches):
+                    print(f"Removed {len(matches) - len(kept)} duplicate chunks.")
+                matches = [matches[i] for i in kept]
+
+            chunks = []
             for match in matches:
-                metadata = match.get('metadata', {})
-                text = metadata.get('text')
-                title = metadata.get('title')
-                
-                if text:
-                    text_list.append(text)
-
-                # Add paper details if the title is present and hasn't been seen before
-                if title and title not in seen_papers:
-                    seen_papers.add(title)
-                    source_papers.append({
-                        "title": title,
-                        "authors": metadata.get('authors', 'N/A')
-                    })
-            
-            return text_list, source_papers
+                metadata = match.get('metadata') or {}
+                chunks.append({
+                    "id": match.get('id'),
+                    "score": match.get('score'),
+                    "paper_id": metadata.get('paper_id'),
+                    "text": metadata.get('text'),
+                    "title": metadata.get('title'),
+                    "authors": metadata.get('authors', 'N/A'),
+                })
+
+            self.retrieval_cache.set(cache_key, [dict(chunk) for chunk in chunks])
+            return chunks
 
         except Exception as e:
             print(f"An error occurred during the query process: {e}")
-            return [], []
+            return []
+
+    def _hydrate(self, matches: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Attaches chunk text and metadata from the local document store to
+        id-only matches. Matches missing from the store are dropped.
+        """
+        hydrated = []
+        documents = self.documents.get_many([match.get('id') for match in matches])
+        for match, metadata in zip(matches, documents):
+            if metadata is None:
+                continue
+            hydrated.append({"id": match.get('id'), "score": match.get('score'), "metadata": metadata})
+        if len(hydrated) < len(matches):
+            print(f"Warning: {len(matches) - len(hydrated)} matches were not found in the document store.")
+        return hydrated
+
+    @staticmethod
+    def texts_and_sources(chunks: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, str]]]:
+        """
+        Splits retrieved chunks into their texts and the unique source papers.
+        """
+        text_list = []
+        source_papers = []
+        seen_papers = set() # To track unique papers
+
+        for chunk in chunks:
+            text = chunk.get('text')
+            title = chunk.get('title')
+            
+            if text:
+                text_list.append(text)
 
+            # Add paper details if the title is present and hasn't been seen before
+            if title and title not in seen_papers:
+                seen_papers.add(title)
+                source_papers.append({
+                    "title": title,
+                    "authors": chunk.get('authors', 'N/A')
+                })
+        return text_list, source_papers
+
+    @staticmethod
+    def pack_chunks(chunks: List[Dict[str, Any]], max_tokens: int) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        Packs the texts of retrieved chunks into a context string within a
+        token budget.
+
+        Returns:
+            (context, unique source papers of the packed chunks only), so a
+            prompt never lists a paper whose text it does not include.
+        """
+        with_text = [chunk for chunk in chunks if chunk.get('text')]
+        context, packed = pack_context([chunk['text'] for chunk in with_text], max_tokens)
+        _, source_papers = RAGService.texts_and_sources([with_text[i] for i in packed])
+        return context, source_papers
+
+    def query(self, user_query: str, top_k: int = 100, filter: Optional[Dict[str, Any]] = None,
+              min_score: Optional[float] = None, adaptive: Optional[bool] = None) -> Tuple[List[str], List[Dict[str, str]]]:
+        """
+        Searches the vector index, processes the results, and returns a combined
+        list of texts and a list of unique source papers.
+
+        Args:
+            user_query (str): The query text from the user.
+            top_k (int, optional): The maximum number of results to retrieve. Defaults to 100.
+            filter (Dict[str, Any], optional): Pinecone-style metadata filter. Defaults to None.
+            min_score (float, optional): Minimum similarity; see `search`.
+            adaptive (bool, optional): Cut at the score knee; see `search`.
+
+        Returns:
+            Tuple[List[str], List[Dict[str, str]]]: 
+                A tuple containing:
+                - A list of the retrieved text chunks.
+                - A list of unique source papers, each as a dictionary with 'title' and 'authors'.
+        """
+        return self.texts_and_sources(self.search(user_query, top_k, filter, min_score, adaptive))
+
+    async def asearch(self, user_query: str, top_k: int = 100, filter: Optional[Dict[str, Any]] = None,
+                      min_score: Optional[float] = None, adaptive: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Async variant of `search` that runs the retrieval on the service's
+        executor instead of blocking the event loop.
+        """
+        if not user_query:
+            return []
+        try:
+            query_embedding = await self.aembed_query(user_query)
+        except Exception as e:
+            print(f"An error occurred while embedding the query: {e}")
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(self.search, user_query, top_k, filter, min_score, adaptive, query_embedding)
+        )
+
+    async def aquery(self, user_query: str, top_k: int = 100, filter: Optional[Dict[str, Any]] = None,
+                     min_score: Optional[float] = None, adaptive: Optional[bool] = None) -> Tuple[List[str], List[Dict[str, str]]]:
+        """
+        Async variant of `query` that runs the retrieval on the service's
+        executor instead of blocking the event loop.
+        """
+        return self.texts_and_sources(await self.asearch(user_query, top_k, filter, min_score, adaptive))
+
+
+# A single RAGService is shared by every service in the process so the
+# embedding model and the Pinecone client are only loaded once per worker.
+_rag_service = None
+_rag_service_lock = threading.Lock()
+
+
+def get_rag_service(preload: bool = False) -> RAGService:
+    """
+    Returns the process-wide RAGService, creating it on first use.
+
+    Args:
+        preload (bool): Create it for sharing with forked workers; see `RAGService`.
+    """
+    global _rag_service
+    if _rag_service is None:
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RAGService(preload=preload)
+    return _rag_service
@@ -0,0 +1,102 @@
+import time
+import asyncio
+from typing import Any, Dict, Optional
+from app.services.rag_service import RAGService, get_rag_service
+from app.services.chatbot_service import ChatbotService
+from app.services.summarize_service import SummarizeService
+
+
+class ServiceRegistry:
+    """
+    Holds the application's services and builds them in the background after
+    the server has started, so startup never blocks on loading the embedding
+    model or reaching the vector index, and a failure is retried instead of
+    crashing the process.
+    """
+
+    def __init__(self):
+        self.rag: Optional[RAGService] = None
+        self.chatbot: Optional[ChatbotService] = None
+        self.summarize: Optional[SummarizeService] = None
+        self.ready = False
+        self.error: Optional[str] = None
+        # Seconds spent in each warm-up phase
+        self.timings: Dict[str, float] = {}
+
+    def _build(self):
+        """
+        Constructs the services, timing each phase. Runs in a worker thread.
+        """
+        started = time.perf_counter()
+        self.rag = get_rag_service()
+        self.timings["rag"] = time.perf_counter() - started
+        for phase, seconds in self.rag.warmup_timings.items():
+            self.timings[f"rag.{phase}"] = seconds
+
+        started = time.perf_counter()
+        self.chatbot = ChatbotService()
+        self.timings["chatbot"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self.summarize = SummarizeService()
+        self.timings["summarize"] = time.perf_counter() - started
+
+    async def warm_up(self, max_backoff: float = 30.0):
+        """
+        Builds the services, retrying with exponential backoff until it succeeds.
+        """
+        backoff = 1.0
+        while not self.ready:
+            try:
+                await asyncio.to_thread(self._build)
+                self.ready = True
+                self.error = None
+                print(f"Services are ready. Warm-up timings: {self.timings}")
+            except Exception as e:
+                self.error = str(e)
+                print(f"Warm-up failed, retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, max_backoff)
+
+    async def check_readiness(self, timeout: float = 2.0) -> Dict[str, Any]:
+        """
+        Reports whether the model is loaded and the vector index is reachable.
+        """
+        status = {
+            "ready": False,
+            "model_loaded": self.rag is not None and getattr(self.rag, "model", None) is not None,
+            "backend_reachable": False,
+            "timings": self.timings,
+        }
+        if self.error:
+            status["error"] = self.error
+        if not self.ready:
+            return status
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self.rag.index.describe_index_stats), timeout)
+            status["backend_reachable"] = True
+        except Exception as e:
+            status["error"] = f"Vector index unreachable: {e!r}"
+        status["ready"] = status["model_loaded"] and status["backend_reachable"]
+        return status
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Collects hit/miss counters of the services' caches and request
+        coalescing. The disk tiers are counted with SQLite queries, so call
+        this off the event loop.
+        """
+        stats = {}
+        if self.rag is not None:
+            stats.update(self.rag.cache_stats())
+        if self.summarize is not None:
+            if self.summarize.summary_cache is not None:
+                for tier, tier_stats in self.summarize.summary_cache.stats().items():
+                    stats[f"summary_{tier}"] = tier_stats
+            stats["summary_in_flight"] = self.summarize.in_flight.stats()
+        if self.chatbot is not None:
+            stats["chat_in_flight"] = self.chatbot.in_flight.stats()
+        return stats
+
+
+registry = ServiceRegistry()
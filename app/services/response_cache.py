@@ -0,0 +1,119 @@
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from app.services.cache import LRUCache, DiskCache
+
+
+class ResponseCache:
+    """
+    Caches finished responses (e.g. a summary and its chart) so a repeated or
+    near-identical question is answered without calling the LLM again.
+
+    Entries are grouped by the set of chunk ids the question retrieved, so a
+    response is only reused when it was generated from exactly the same
+    context. Within a group, the entry whose query embedding is most similar
+    to the new query is returned if the similarity reaches the threshold.
+    Entries also record their papers, so they can be dropped when those
+    papers are re-ingested.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: Optional[float], similarity_threshold: float,
+                 path: Optional[str] = None, max_entries_per_key: int = 8):
+        """
+        Args:
+            max_size: Most chunk-id groups kept in memory.
+            ttl_seconds: How long a response stays valid in either tier.
+            similarity_threshold: Minimum cosine similarity between query
+                embeddings for a cached response to be reused.
+            path: SQLite file for the persistent tier; None keeps responses
+                in memory only.
+            max_entries_per_key: Most differently-worded queries kept for one
+                set of chunk ids.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_key = max_entries_per_key
+        self.memory = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.disk = DiskCache(path, ttl_seconds=ttl_seconds) if path else None
+        # Serializes the read-modify-write of a group's entry list
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(chunk_ids: Iterable[str], namespace: str = "") -> str:
+        """
+        Builds the group key from the retrieved chunk ids (order-insensitive).
+        """
+        digest = hashlib.sha1(namespace.encode("utf-8"))
+        for chunk_id in sorted(str(chunk_id) for chunk_id in chunk_ids):
+            digest.update(b"|" + chunk_id.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entries(self, key: str) -> List[Dict[str, Any]]:
+        entries = self.memory.get(key)
+        if entries is None and self.disk is not None:
+            entries = self.disk.get(key)
+            if entries is not None:
+                self.memory.set(key, entries)
+        return entries or []
+
+    def get(self, key: str, embedding: List[float]) -> Optional[Any]:
+        """
+        Returns the cached response for the group whose query is most similar
+        to `embedding`, or None if none is similar enough.
+        """
+        entries = self._entries(key)
+        if not entries:
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query) or 1.0
+        best, best_similarity = None, self.similarity_threshold
+        for entry in entries:
+            cached = np.asarray(entry["embedding"], dtype=np.float32)
+            similarity = float(cached @ query) / ((np.linalg.norm(cached) or 1.0) * query_norm)
+            if similarity >= best_similarity:
+                best, best_similarity = entry, similarity
+        return None if best is None else best["response"]
+
+    def set(self, key: str, embedding: List[float], papers: Iterable[str], response: Any):
+        """
+        Stores a response for a group, keeping the newest entries per group.
+        """
+        entry = {"embedding": list(embedding), "papers": sorted(set(papers)), "response": response}
+        with self._lock:
+            entries = (self._entries(key) + [entry])[-self.max_entries_per_key:]
+            self.memory.set(key, entries)
+            if self.disk is not None:
+                self.disk.set(key, entries)
+
+    def invalidate_papers(self, papers: Iterable[str]) -> int:
+        """
+        Drops every group with a response built from any of the given papers.
+
+        Returns:
+            The number of groups removed.
+        """
+        papers = set(papers)
+        if "*" in papers:
+            self.clear()
+            return 0
+
+        def stale(entries):
+            return any(papers.intersection(entry["papers"]) for entry in entries)
+
+        with self._lock:
+            removed = self.memory.invalidate_where(stale)
+            if self.disk is not None:
+                removed = max(removed, self.disk.invalidate_where(stale))
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+            if self.disk is not None:
+                self.disk.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        stats = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+
+class ChatSessionStore:
+    """
+    Keeps per-conversation chat history in memory, keyed by session id.
+
+    Each session holds at most `max_turns` question/answer pairs; older turns
+    are dropped first. Sessions idle for longer than `ttl_seconds` are evicted,
+    and when more than `max_sessions` are active the least recently used one
+    is dropped.
+    """
+
+    def __init__(self, max_turns: int = 6, ttl_seconds: float = 1800, max_sessions: int = 10000):
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        # session_id -> {"turns": [(user_text, model_text), ...], "last_used": float}
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def get_history(self, session_id: str) -> List[Dict]:
+        """
+        Returns the stored turns of a session in the Gemini `history` format.
+        """
+        self._evict_idle()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+        self._sessions.move_to_end(session_id)
+        session["last_used"] = time.monotonic()
+
+        history = []
+        for user_text, model_text in session["turns"]:
+            history.append({"role": "user", "parts": [{"text": user_text}]})
+            history.append({"role": "model", "parts": [{"text": model_text}]})
+        return history
+
+    def add_turn(self, session_id: str, user_text: str, model_text: str):
+        """
+        Appends a question/answer pair to a session, trimming it to `max_turns`.
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = {"turns": [], "last_used": time.monotonic()}
+            self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        session["last_used"] = time.monotonic()
+
+        session["turns"].append((user_text, model_text))
+        excess = len(session["turns"]) - self.max_turns
+        if excess > 0:
+            del session["turns"][:excess]
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def clear(self, session_id: str):
+        """
+        Forgets a session.
+        """
+        self._sessions.pop(session_id, None)
+
+    def _evict_idle(self):
+        """
+        Drops sessions that have not been used within `ttl_seconds`.
+        """
+        cutoff = time.monotonic() - self.ttl_seconds
+        # Sessions are kept in least-recently-used order, so stop at the first fresh one.
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session["last_used"] >= cutoff:
+                break
+            self._sessions.popitem(last=False)
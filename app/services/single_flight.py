@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts the
+    work and later callers await the same result instead of repeating it.
+    Once the work finishes the key is released, so later calls start afresh.
+    The work is cancelled only when every caller waiting on it is cancelled.
+    """
+
+    def __init__(self):
+        # key -> [task, number of callers waiting on it]
+        self._in_flight: Dict[Hashable, List[Any]] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs `factory()` for `key`, or joins the run already in flight.
+
+        Args:
+            key: Identifies calls that would compute the same result.
+            factory: Starts the work; only called when no run is in flight.
+
+        Returns:
+            The result of the shared run. Exceptions are raised to every caller.
+        """
+        flight = self._in_flight.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(factory())
+            flight = [task, 0]
+            self._in_flight[key] = flight
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.started += 1
+        else:
+            self.joined += 1
+        task = flight[0]
+        flight[1] += 1
+        try:
+            # One caller going away must not cancel the work for the others
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                # The last waiter was cancelled; nobody needs the result. The key
+                # is released now, so a caller arriving while the task unwinds
+                # starts fresh work instead of joining the cancelled run.
+                self._release(key, task)
+                task.cancel()
+
+    def _release(self, key: Hashable, task: "asyncio.Task"):
+        flight = self._in_flight.get(key)
+        if flight is not None and flight[0] is task:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"started": self.started, "joined": self.joined, "in_flight": len(self._in_flight)}
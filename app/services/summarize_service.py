@@ -1,9 +1,17 @@
 import os
 import json
-from groq import Groq
+import asyncio
+import contextlib
+from groq import AsyncGroq
 from app.config import settings
-from typing import Dict, Any
-from app.services.rag_service import RAGService
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from app.services.rag_service import get_rag_service
+from app.services.context_builder import pack_context, context_budget, truncate_to_budget
+from app.services.visualization_gate import visualization_gate
+from app.services.chart_extractor import extract_chart
+from app.services.response_cache import ResponseCache
+from app.services.single_flight import SingleFlight
+from app.services.cache import normalize_query
 
 class SummarizeService:
     """
@@ -49,20 +57,34 @@ AI Response:
         if not settings.GROQ_API_KEY:
             raise ValueError("GROQ_API_KEY not found in environment variables.")
         
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        # The async client lets the endpoints await completions without
+        # blocking the event loop.
+        self.client = AsyncGroq(api_key=settings.GROQ_API_KEY)
         self.model = "llama-3.3-70b-versatile"
         self.fast_model = "llama-3.1-8b-instant" # A faster model for simple classification
         print("SummarizeService initialized.")
-        self.ragServe = RAGService()
+        self.ragServe = get_rag_service()
+        # Finished summaries, dropped when the papers they were built from change
+        self.summary_cache = None
+        if settings.SUMMARY_CACHE_ENABLED:
+            self.summary_cache = ResponseCache(
+                max_size=settings.SUMMARY_CACHE_SIZE,
+                ttl_seconds=settings.SUMMARY_CACHE_TTL_SECONDS,
+                similarity_threshold=settings.SUMMARY_CACHE_SIMILARITY,
+                path=settings.SUMMARY_CACHE_PATH,
+            )
+            self.ragServe.add_invalidation_listener(self.summary_cache.invalidate_papers)
+        # Concurrent requests for the same topic share one generation
+        self.in_flight = SingleFlight()
         # self.warmup()
 
-    def warmup(self):
+    async def warmup(self):
         """
         Performs a simple test call to the Groq API to ensure the model is ready.
         """
         print("Warming up the summarization model...")
         try:
-            self.client.chat.completions.create(
+            await self.client.chat.completions.create(
                 messages=[{"role": "user", "content": "Test call"}],
                 model=self.model,
                 max_tokens=10,
@@ -82,10 +104,10 @@ AI Response:
         # It specifies the exact JSON structure, preferred chart types, and rules,
         # ensuring the output is consistently machine-readable for Chart.js.
         return """
-        You are an expert data visualization assistant. Your task is to analyze a user's query and a text summary to generate a JSON object suitable for Chart.js.
+        You are an expert data visualization assistant. Your task is to analyze a user's query and a text (research excerpts or a summary) to generate a JSON object suitable for Chart.js.
 
         Instructions:
-        1. Read the user's query and the provided summary carefully.
+        1. Read the user's query and the provided text carefully.
         2. Identify the key data points, labels, and numerical values that can be visualized.
         3. Choose the most appropriate chart type from: 'bar', 'line', 'pie', 'doughnut', 'radar', or 'polarArea'. A 'bar' chart is often a good default choice for comparisons.
         4. Construct a JSON object that strictly follows the Chart.js configuration format.
@@ -131,30 +153,20 @@ AI Response:
         }
         """
 
-    def _generate_visualization_data(self, query: str, summary: str) -> Dict[str, Any]:
+    async def _should_visualize(self, query: str, text: str) -> bool:
         """
-        Determines if a query/summary is suitable for visualization and, if so,
-        generates the data in a Chart.js-compatible JSON format.
-
-        Args:
-            query: The original user query.
-            summary: The text summary containing the data to be visualized.
-
-        Returns:
-            A dictionary formatted for Chart.js, or an empty dictionary {} if
-            no visualization is generated or an error occurs.
+        Asks the fast model whether the query and text are suitable for a chart.
         """
-        # Step 1: Fast check to see if visualization is plausible.
         print(f"Checking if visualization is needed for query: '{query}'")
         try:
             check_prompt = (
-                "Does the user query and the provided summary contain topics like data, trends, numbers, "
+                "Does the user query and the provided text contain topics like data, trends, numbers, "
                 "comparisons, or entities that would be suitable for a data visualization? "
                 "Respond with only 'YES' or 'NO'.<br><br>"
-                f"Query: '{query}'<br><br>Summary: '{summary}'"
+                f"Query: '{query}'<br><br>Text: '{text}'"
             )
             
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 messages=[{"role": "user", "content": check_prompt}],
                 model=self.fast_model,
                 max_tokens=5,
@@ -162,19 +174,21 @@ AI Response:
             )
             decision = response.choices[0].message.content.strip().upper()
             print(f"AI decision for visualization: {decision}")
-            if "YES" not in decision:
-                return {}
+            return "YES" in decision
         except Exception as e:
             print(f"Error in initial visualization check: {e}")
-            return {}
+            return False
 
-        # Step 2: If plausible, generate the actual chart data.
+    async def _generate_chart(self, query: str, text: str) -> Dict[str, Any]:
+        """
+        Generates Chart.js JSON for the data in the text, or {} on failure.
+        """
         print("Visualization is needed. Generating chart data...")
         try:
             system_prompt = self._get_visualization_system_prompt()
-            user_content = f"Query: '{query}'<br><br>Summary: '{summary}'"
+            user_content = f"Query: '{query}'<br><br>Text: '{text}'"
 
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_content}
@@ -195,30 +209,59 @@ AI Response:
             print(f"Error in visualization data generation: {e}")
             return {}
 
-    def generate_summary(self, query: str) -> Dict[str, Any]:
+    async def _generate_visualization_data(self, query: str, text: str, chunks: Optional[List[str]] = None) -> Dict[str, Any]:
         """
-        Generates a long-form summary and conditionally adds visualization data.
+        Determines if a query and text are suitable for visualization and, if so,
+        generates the data in a Chart.js-compatible JSON format.
+
+        Args:
+            query: The original user query.
+            text: The text containing the data to be visualized; the retrieved
+                context, so this can run while the summary is generated.
+            chunks: The retrieved chunks `text` was packed from. Chart values
+                are only combined within one chunk; defaults to `[text]`.
+
+        Returns:
+            A dictionary formatted for Chart.js, or an empty dictionary {} if
+            no visualization is generated or an error occurs.
         """
-        
-        
-        try:
-            
-            print(f"Retrieving context for query: '{query}'...")
-            retrieved_texts, source_papers = self.ragServe.query(query, top_k=100)
-            
-            
-            if not retrieved_texts:
-                print("No relevant context found by RAG service.")
-                no_context_message = f"# No Information Found\n\nSorry, we could not find any relevant information for the topic: '{query}'. Please try a different query."
-                return {"summary": no_context_message, "visualization_data": {}, "sources": []}
+        # Keep the text within what the fast model's prompt can hold
+        text = truncate_to_budget(text, context_budget(self.fast_model))
+
+        # Step 1: Fast check to see if visualization is plausible. The local
+        # gate settles clear cases; only ambiguous ones cost an LLM round trip.
+        decision = None
+        if settings.VISUALIZATION_GATE_ENABLED:
+            decision = visualization_gate(
+                query, text, settings.VISUALIZATION_GATE_YES, settings.VISUALIZATION_GATE_NO
+            )
+            print(f"Local visualization gate decision: {decision}")
+        if decision is None:
+            decision = await self._should_visualize(query, text)
+        if not decision:
+            return {}
 
-            # Combine the retrieved text chunks into a single context string
-            context_str = "\n\n---\n\n".join(retrieved_texts)
-            sources_formatted = ""
-            for i, paper in enumerate(source_papers):
-                sources_formatted += f"[{i+1}] Title: {paper.get('title', 'N/A')}, Authors: {paper.get('authors', 'N/A')}\n"
+        # Step 2: If plausible, build the chart from the numbers in the text,
+        # and ask the LLM only when nothing chartable can be extracted.
+        if settings.CHART_EXTRACTION_ENABLED:
+            chart = extract_chart(query, chunks or [text], min_points=settings.CHART_EXTRACTION_MIN_POINTS)
+            if chart:
+                print(f"Extracted a {chart['type']} chart locally.")
+                return chart
+        return await self._generate_chart(query, text)
 
-            user_prompt = f"""
+    def _build_summary_prompt(self, query: str, chunks: List[Dict[str, Any]]) -> str:
+        """
+        Builds the user prompt for the summary from the retrieved chunks.
+        """
+        # Pack the best retrieved chunks into a context string within the
+        # model's budget; only the papers of packed chunks are listed
+        context_str, source_papers = self.ragServe.pack_chunks(chunks, context_budget(self.model))
+        sources_formatted = ""
+        for i, paper in enumerate(source_papers):
+            sources_formatted += f"[{i+1}] Title: {paper.get('title', 'N/A')}, Authors: {paper.get('authors', 'N/A')}\n"
+
+        return f"""
                 You are a specialized research assistant. Your task is to answer the user's query based ONLY on the provided context and sources.
 
                 **Instructions:**
@@ -245,37 +288,229 @@ AI Response:
 
                 **Answer:**
             """
+
+    def _summary_request(self, user_prompt: str) -> Dict[str, Any]:
+        """
+        Returns the chat completion arguments for the main summary.
+        """
+        return dict(
+            messages=[
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            model=self.model,
+            temperature=0.7,
+            max_tokens=4096,
+        )
+
+    def _visualization_context(self, retrieved_texts: List[str]) -> Tuple[str, List[str]]:
+        """
+        Packs the retrieved chunks into the fast model's context budget.
+
+        Returns:
+            (packed context, the chunks it was packed from)
+        """
+        viz_context, packed = pack_context(retrieved_texts, context_budget(self.fast_model))
+        return viz_context, [retrieved_texts[i] for i in packed]
+
+    def _start_visualization(self, query: str, retrieved_texts: List[str]) -> "asyncio.Task":
+        """
+        Starts generating visualization data from the retrieved context in the
+        background and returns the task.
+        """
+        viz_context, chunks = self._visualization_context(retrieved_texts)
+        return asyncio.create_task(self._generate_visualization_data(query, viz_context, chunks))
+
+    async def _retrieve(self, query: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Retrieves the chunks for a query, with their texts.
+        """
+        print(f"Retrieving context for query: '{query}'...")
+        chunks = await self.ragServe.asearch(query, top_k=100)
+        retrieved_texts, _ = self.ragServe.texts_and_sources(chunks)
+        return chunks, retrieved_texts
+
+    async def _cached_summary(self, query: str, chunks: List[Dict[str, Any]]) -> Tuple[Optional[str], Optional[List[float]], Optional[Dict[str, Any]]]:
+        """
+        Looks up a summary of the same chunks for a similar query.
+
+        Returns:
+            (cache key, query embedding, cached response or None); the key and
+            embedding are None when the cache is disabled.
+        """
+        if self.summary_cache is None:
+            return None, None, None
+        # The embedding was computed for retrieval, so this is a cache hit
+        embedding = await self.ragServe.aembed_query(query)
+        key = ResponseCache.key((chunk.get("id") for chunk in chunks), namespace=self.model)
+        # The lookup may read the SQLite tier, so it runs off the event loop
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(self.ragServe.executor, self.summary_cache.get, key, embedding)
+        if cached is not None:
+            print("Summary cache hit.")
+            cached = dict(cached)
+        return key, embedding, cached
+
+    async def _store_summary(self, key: Optional[str], embedding: Optional[List[float]],
+                             chunks: List[Dict[str, Any]], response: Dict[str, Any]):
+        if key is None:
+            return
+        papers = set()
+        for chunk in chunks:
+            papers.update(paper for paper in (chunk.get("paper_id"), chunk.get("title")) if paper)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.ragServe.executor, self.summary_cache.set, key, embedding, papers, response)
+        except Exception as e:
+            # The summary is still good; only caching it failed
+            print(f"Error storing the summary in the cache: {e}")
+
+    @staticmethod
+    def _no_context_message(query: str) -> str:
+        return f"# No Information Found\n\nSorry, we could not find any relevant information for the topic: '{query}'. Please try a different query."
+
+    async def generate_summary(self, query: str, llm_slots: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+        """
+        Generates a long-form summary and conditionally adds visualization data.
+        Concurrent calls with the same (normalized) query share one generation.
+
+        Args:
+            query: The topic to summarize.
+            llm_slots: Optional semaphore held while the LLM calls run, to cap
+                how many summaries are generated at once.
+        """
+        if not settings.REQUEST_COALESCING_ENABLED:
+            return await self._generate_summary(query, llm_slots)
+        response = await self.in_flight.do(normalize_query(query), lambda: self._generate_summary(query, llm_slots))
+        # Each caller gets its own copy of the shared result
+        return dict(response)
+
+    async def _generate_summary(self, query: str, llm_slots: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+        """
+        Retrieves context and generates the summary and visualization for one query.
+        """
+        viz_task = None
+        try:
+            chunks, retrieved_texts = await self._retrieve(query)
+
+            if not retrieved_texts:
+                print("No relevant context found by RAG service.")
+                return {"summary": self._no_context_message(query), "visualization_data": {}, "sources": []}
+
+            # A similar query over the same chunks was already summarized
+            cache_key, query_embedding, cached = await self._cached_summary(query, chunks)
+            if cached is not None:
+                return cached
+
+            user_prompt = self._build_summary_prompt(query, chunks)
+
+            async with llm_slots or contextlib.nullcontext():
+                # 1. Start the visualization check and chart on the retrieved context,
+                # so they run while the main summary is being generated
+                viz_task = self._start_visualization(query, retrieved_texts)
             
-            
-            
-            # 1. Generate the main summary as a JSON object
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
-                model=self.model,
-                temperature=0.7,
-                max_tokens=4096,
-                # For models that support it, you can enforce JSON output
-                # response_format={"type": "json_object"}, 
-            )
-            response_text = chat_completion.choices[0].message.content
-            
-            # Parse the AI's JSON response
-            try:
-                print(response_text)
-                summary_markdown = response_text
-            except json.JSONDecodeError:
-                print(f"Failed to decode JSON from AI response")
-                summary_markdown = "# Error<br><br>AI failed to return valid JSON. Please try again."
-
-            # 2. Decide whether to add visualization data based on the query
-            viz_data = self._generate_visualization_data(query, summary_markdown)
-            return {"summary": summary_markdown, "visualization_data": viz_data}
+                # 2. Generate the main summary
+                chat_completion = await self.client.chat.completions.create(**self._summary_request(user_prompt))
+                summary_markdown = chat_completion.choices[0].message.content
+                print(summary_markdown)
+
+                viz_data = await viz_task
+            response = {"summary": summary_markdown, "visualization_data": viz_data}
+            await self._store_summary(cache_key, query_embedding, chunks, response)
+            return response
 
         except Exception as e:
+            if viz_task is not None:
+                viz_task.cancel()
             print(f"An error occurred while generating the summary: {e}")
             error_message = f"# Error<br><br>Sorry, the summary could not be generated. **Details:** {e}"
             return {"summary": error_message, "visualization_data": {}}
 
+    async def generate_summaries(self, queries: List[str], concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Summarizes many topics, yielding {"index", "query", "summary",
+        "visualization_data"} for each one as soon as it is done, so results
+        arrive in completion order rather than input order.
+
+        The queries are embedded in one batch and retrieved concurrently; at
+        most `concurrency` summaries are generated by the LLM at a time.
+
+        Args:
+            queries: The topics to summarize.
+            concurrency: Most summaries in generation at once. Defaults to
+                `SUMMARIZE_BATCH_CONCURRENCY`.
+        """
+        if concurrency is None:
+            concurrency = settings.SUMMARIZE_BATCH_CONCURRENCY
+        try:
+            # Fills the embedding cache, so each retrieval below skips encoding
+            await self.ragServe.aembed_queries(queries)
+        except Exception as e:
+            print(f"Error batch-encoding queries; encoding them one at a time: {e}")
+
+        llm_slots = asyncio.Semaphore(max(1, concurrency))
+
+        async def summarize(index: int, query: str) -> Dict[str, Any]:
+            result = await self.generate_summary(query, llm_slots)
+            return {"index": index, "query": query, **result}
+
+        tasks = [asyncio.create_task(summarize(index, query)) for index, query in enumerate(queries)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client went away or the batch failed; stop the remaining work
+            for task in tasks:
+                task.cancel()
+
+    async def stream_summary(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generates a summary like `generate_summary`, yielding events as soon as
+        they are available:
+        - {"event": "token", "data": {"text": ...}} for each piece of the summary,
+        - {"event": "visualization", "data": {...}} once the chart data is ready,
+        - {"event": "error", "data": {"message": ...}} if generation fails,
+        - {"event": "done", "data": {}} at the end.
+        """
+        viz_task = None
+        try:
+            chunks, retrieved_texts = await self._retrieve(query)
+            cache_key, query_embedding, cached = None, None, None
+            if retrieved_texts:
+                cache_key, query_embedding, cached = await self._cached_summary(query, chunks)
+
+            if not retrieved_texts:
+                print("No relevant context found by RAG service.")
+                yield {"event": "token", "data": {"text": self._no_context_message(query)}}
+                yield {"event": "visualization", "data": {}}
+            elif cached is not None:
+                yield {"event": "token", "data": {"text": cached["summary"]}}
+                yield {"event": "visualization", "data": cached["visualization_data"]}
+            else:
+                user_prompt = self._build_summary_prompt(query, chunks)
+                # The chart is prepared from the retrieved context while tokens stream
+                viz_task = self._start_visualization(query, retrieved_texts)
+                stream = await self.client.chat.completions.create(**self._summary_request(user_prompt), stream=True)
+                parts = []
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield {"event": "token", "data": {"text": delta}}
+
+                viz_data = await viz_task
+                await self._store_summary(
+                    cache_key, query_embedding, chunks,
+                    {"summary": "".join(parts), "visualization_data": viz_data},
+                )
+                yield {"event": "visualization", "data": viz_data}
+
+        except Exception as e:
+            print(f"An error occurred while streaming the summary: {e}")
+            yield {"event": "error", "data": {"message": f"Sorry, the summary could not be generated. Details: {e}"}}
+        finally:
+            # Also reached when the client disconnects (GeneratorExit or
+            # CancelledError); the chart is no longer needed then
+            if viz_task is not None and not viz_task.done():
+                viz_task.cancel()
+        yield {"event": "done", "data": {}}
@@ -0,0 +1,654 @@
+import os
+import json
+import mmap
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+from app.config import settings
+
+
+class VectorStore:
+    """
+    Interface for the vector index used by RAGService.
+
+    Query results follow the Pinecone response shape so callers can process
+    any backend the same way:
+        {"matches": [{"id": str, "score": float, "metadata": dict}, ...]}
+    """
+
+    def query(self, vector: List[float], top_k: int, filter: Optional[Dict[str, Any]] = None,
+              include_metadata: bool = True, include_values: bool = False) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        """
+        Inserts or replaces vectors given as {"id", "values", "metadata"} dicts.
+        """
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def refresh(self) -> bool:
+        """
+        Picks up changes written by another process. Returns True if the
+        store changed. Remote stores are always current.
+        """
+        return False
+
+
+class PineconeVectorStore(VectorStore):
+    """
+    A vector store backed by a Pinecone index.
+    """
+
+    def __init__(self, api_key: str, index_name: str):
+        # Imported here so the local backend does not require the Pinecone client.
+        from pinecone import Pinecone
+
+        self.index_name = index_name
+        pc = Pinecone(api_key=api_key)
+        self.index = pc.Index(index_name)
+
+    def query(self, vector: List[float], top_k: int, filter: Optional[Dict[str, Any]] = None,
+              include_metadata: bool = True, include_values: bool = False) -> Dict[str, Any]:
+        return self.index.query(
+            vector=vector,
+            top_k=top_k,
+            filter=filter,
+            include_metadata=include_metadata,
+            include_values=include_values
+        )
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        self.index.upsert(vectors=vectors)
+
+    def delete(self, ids: List[str]):
+        self.index.delete(ids=ids)
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        return self.index.describe_index_stats()
+
+
+class MetadataColumn:
+    """
+    One metadata field of a local index, stored column-wise in three
+    append-only files that are opened memory-mapped:
+    - `<name>.dat`: the JSON-encoded values, concatenated.
+    - `<name>.ends`: the end offset of each value in `.dat` (uint64).
+    - `<name>.rows`: the row each value belongs to (uint64, increasing).
+    Rows without the field have no entry, so a field can first appear at any
+    row. A value is found by binary search over `.rows`, so reading a few
+    rows' metadata touches a few pages and no process holds a column in its
+    heap.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.rows = np.zeros(0, dtype=np.uint64)
+        self.ends = np.zeros(0, dtype=np.uint64)
+        self.data = b""
+        self._sizes = None
+        self.map()
+
+    def _map_array(self, suffix: str, n: int) -> np.ndarray:
+        if n == 0:
+            return np.zeros(0, dtype=np.uint64)
+        return np.memmap(self.prefix + suffix, dtype=np.uint64, mode="r", shape=(n,))
+
+    def map(self):
+        """
+        (Re)maps the column files after they have grown. Writers append the
+        data, then the ends, then the rows, so mapping in the opposite order
+        never yields a row whose value is not mapped.
+        """
+        paths = [self.prefix + suffix for suffix in (".rows", ".ends", ".dat")]
+        sizes = tuple(os.path.getsize(path) if os.path.exists(path) else 0 for path in paths)
+        if sizes == self._sizes:
+            return
+        n = sizes[0] // 8
+        rows = self._map_array(".rows", n)
+        ends = self._map_array(".ends", n)
+        data = b""
+        if os.path.exists(paths[2]) and os.path.getsize(paths[2]) > 0:
+            with open(paths[2], "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data, self.ends, self.rows = data, ends, rows
+        self._sizes = sizes
+
+    def values(self, rows: np.ndarray) -> List[Any]:
+        """
+        Returns the values of the given rows, None where a row has none.
+        """
+        column_rows, ends, data = self.rows, self.ends, self.data
+        positions = np.searchsorted(column_rows, rows)
+        values = []
+        for row, i in zip(rows.tolist(), positions.tolist()):
+            if i == len(column_rows) or int(column_rows[i]) != row:
+                values.append(None)
+                continue
+            start = int(ends[i - 1]) if i else 0
+            values.append(json.loads(data[start:int(ends[i])]))
+        return values
+
+    def append(self, rows: List[int], values: List[Any], n_rows: int):
+        """
+        Appends values for new rows, first cutting off entries an interrupted
+        upsert left for rows at or past `n_rows`.
+        """
+        self.map()
+        keep = int(np.searchsorted(self.rows, n_rows))
+        data_end = int(self.ends[keep - 1]) if keep else 0
+        encoded = [json.dumps(value, separators=(",", ":")).encode("utf-8") for value in values]
+        ends = data_end + np.cumsum([len(value) for value in encoded], dtype=np.uint64)
+        for suffix, size, data in ((".dat", data_end, b"".join(encoded)),
+                                   (".ends", keep * 8, ends.astype(np.uint64).tobytes()),
+                                   (".rows", keep * 8, np.asarray(rows, dtype=np.uint64).tobytes())):
+            path = self.prefix + suffix
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+            with open(path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        self.map()
+
+
+class LocalVectorStore(VectorStore):
+    """
+    An in-process vector store for corpora that fit on one machine.
+
+    The index is append-only, so an upsert costs time proportional to the
+    batch rather than to the corpus:
+    - `embeddings.f32`: L2-normalized float32 rows appended raw, opened
+      memory-mapped so forked workers share pages.
+    - `columns/`: metadata stored column-wise, one `MetadataColumn` per
+      field, memory-mapped so chunk text is not copied into every worker.
+    - `rows.jsonl`: one line per appended row ({"id"}) or per deleted id
+      ({"delete": id}). Only ids are held in memory.
+    - `index.json`: the embedding dimension.
+    Replacing a vector appends a new row and retires the old one. Retired and
+    deleted rows stay in the files and are masked out of searches. Search is
+    an exact cosine top-k: one matrix-vector product followed by
+    `argpartition`.
+    """
+
+    EMBEDDINGS_FILE = "embeddings.f32"
+    ROWS_FILE = "rows.jsonl"
+    INDEX_FILE = "index.json"
+    COLUMNS_DIR = "columns"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._reset()
+        self.refresh()
+
+    def _reset(self):
+        self.dimension = None
+        self.embeddings = None
+        # Row -> chunk id, including retired rows
+        self.ids: List[str] = []
+        # Field name -> its column
+        self.columns: Dict[str, MetadataColumn] = {}
+        # Chunk id -> its live row
+        self.id_to_row: Dict[str, int] = {}
+        # Whether each row is live; grown by doubling, valid up to len(self.ids)
+        self._live = np.zeros(0, dtype=bool)
+        # Bytes of `rows.jsonl` applied so far
+        self._rows_offset = 0
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _column_prefix(self, name: str) -> str:
+        return os.path.join(self.path, self.COLUMNS_DIR, quote(name, safe=""))
+
+    def _map_columns(self):
+        """
+        Opens columns created since the last refresh and remaps grown ones.
+        """
+        directory = self._file(self.COLUMNS_DIR)
+        if os.path.isdir(directory):
+            for file_name in os.listdir(directory):
+                if file_name.endswith(".rows"):
+                    name = unquote(file_name[:-len(".rows")])
+                    if name not in self.columns:
+                        self.columns[name] = MetadataColumn(self._column_prefix(name))
+        for column in self.columns.values():
+            column.map()
+
+    def refresh(self) -> bool:
+        """
+        Applies rows appended since the index was opened or last refreshed,
+        e.g. by the ingestion job running in another process. Only the new
+        part of the row log is read.
+
+        Returns:
+            True if rows were added or deleted.
+        """
+        with self._lock:
+            rows_path = self._file(self.ROWS_FILE)
+            size = os.path.getsize(rows_path) if os.path.exists(rows_path) else 0
+            if size < self._rows_offset:
+                # The index was removed or rebuilt; start over
+                self._reset()
+            if size == self._rows_offset:
+                return False
+            if self.dimension is None:
+                with open(self._file(self.INDEX_FILE), "r", encoding="utf-8") as f:
+                    self.dimension = json.load(f)["dimension"]
+            # Columns are written before the log, so they cover every new row
+            self._map_columns()
+            with open(rows_path, "rb") as f:
+                f.seek(self._rows_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # a line still being written
+                    self._apply(json.loads(line))
+                    self._rows_offset += len(line)
+            self._map()
+            return True
+
+    def _apply(self, entry: Dict[str, Any]):
+        """
+        Applies one line of the row log.
+        """
+        if "delete" in entry:
+            row = self.id_to_row.pop(entry["delete"], None)
+            if row is not None:
+                self._live[row] = False
+            return
+
+        chunk_id = entry["id"]
+        row = len(self.ids)
+        previous = self.id_to_row.get(chunk_id)
+        if previous is not None:
+            self._live[previous] = False
+        self.ids.append(chunk_id)
+        self.id_to_row[chunk_id] = row
+        if row >= len(self._live):
+            live = np.zeros(max(1024, 2 * len(self._live)), dtype=bool)
+            live[:len(self._live)] = self._live
+            self._live = live
+        self._live[row] = True
+
+    def _map(self):
+        """
+        Maps the embedding rows covered by the row log.
+        """
+        n = len(self.ids)
+        if n == 0:
+            self.embeddings = None
+            return
+        self.embeddings = np.memmap(self._file(self.EMBEDDINGS_FILE), dtype=np.float32, mode="r",
+                                    shape=(n, self.dimension))
+
+    def _append(self, name: str, data: bytes, expected_size: int):
+        """
+        Appends to one of the index files, first cutting off whatever an
+        interrupted upsert left past `expected_size`.
+        """
+        path = self._file(name)
+        if os.path.exists(path) and os.path.getsize(path) > expected_size:
+            os.truncate(path, expected_size)
+        with open(path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _append_rows(self, rows: np.ndarray):
+        """
+        Appends embedding rows; runs before their log lines are written, so a
+        row is never visible without its vector.
+        """
+        self._append(self.EMBEDDINGS_FILE, rows.tobytes(), len(self.ids) * self.dimension * 4)
+
+    def _append_log(self, entries: List[Dict[str, Any]]):
+        data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+        self._append(self.ROWS_FILE, data.encode("utf-8"), self._rows_offset)
+        self.refresh()
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _metadata(self, row: int) -> Dict[str, Any]:
+        metadata = {}
+        for name, column in list(self.columns.items()):
+            value = column.values(np.array([row]))[0]
+            if value is not None:
+                metadata[name] = value
+        return metadata
+
+    def _filter_mask(self, filter: Dict[str, Any], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Evaluates a Pinecone-style metadata filter, on every row or only on
+        `rows`. Supports plain equality, `$eq`, `$ne` and `$in` on top-level
+        fields.
+        """
+        rows = np.arange(len(self.ids)) if rows is None else rows
+        n = len(rows)
+        mask = np.ones(n, dtype=bool)
+        for field, condition in filter.items():
+            column = self.columns.get(field)
+            values = [None] * n if column is None else column.values(rows)
+            if isinstance(condition, dict):
+                if "$eq" in condition:
+                    target = condition["$eq"]
+                    mask &= np.fromiter((v == target for v in values), dtype=bool, count=n)
+                if "$ne" in condition:
+                    target = condition["$ne"]
+                    mask &= np.fromiter((v != target for v in values), dtype=bool, count=n)
+                if "$in" in condition:
+                    targets = set(condition["$in"])
+                    mask &= np.fromiter((v in targets for v in values), dtype=bool, count=n)
+            else:
+                mask &= np.fromiter((v == condition for v in values), dtype=bool, count=n)
+        return mask
+
+    def _candidates(self, query_vector: np.ndarray, filter: Optional[Dict[str, Any]]):
+        """
+        Returns the candidate rows for a query and their cosine scores. The flat
+        index scores every row; subclasses may narrow the candidate set.
+        """
+        # Sized by the mapped rows: a concurrent refresh appends ids first
+        embeddings = self.embeddings
+        n = len(embeddings)
+        rows = np.arange(n)
+        scores = embeddings @ query_vector
+        mask = self._live[:n]
+        if filter:
+            mask = mask & self._filter_mask(filter)[:n]
+        return rows, np.where(mask, scores, -np.inf)
+
+    def query(self, vector: List[float], top_k: int, filter: Optional[Dict[str, Any]] = None,
+              include_metadata: bool = True, include_values: bool = False) -> Dict[str, Any]:
+        if self.embeddings is None or not self.id_to_row or top_k <= 0:
+            return {"matches": []}
+
+        query_vector = self._normalize(np.asarray(vector, dtype=np.float32))
+        rows, scores = self._candidates(query_vector, filter)
+
+        k = min(top_k, len(scores))
+        if k == 0:
+            return {"matches": []}
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for i in top:
+            score = float(scores[i])
+            if score == -np.inf:
+                break
+            row = int(rows[i])
+            match = {"id": self.ids[row], "score": score}
+            if include_metadata:
+                match["metadata"] = self._metadata(row)
+            if include_values:
+                match["values"] = self.embeddings[row].tolist()
+            matches.append(match)
+        return {"matches": matches}
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        if not vectors:
+            return
+        with self._lock:
+            self.refresh()
+            rows = self._normalize(np.asarray([v["values"] for v in vectors], dtype=np.float32))
+            if self.dimension is None:
+                os.makedirs(self.path, exist_ok=True)
+                index_path = self._file(self.INDEX_FILE)
+                with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump({"dimension": int(rows.shape[1])}, f)
+                os.replace(index_path + ".tmp", index_path)
+                self.dimension = int(rows.shape[1])
+            self._append_rows(np.ascontiguousarray(rows, dtype=np.float32))
+            self._append_metadata([v.get("metadata") or {} for v in vectors])
+            self._append_log([{"id": v["id"]} for v in vectors])
+
+    def _append_metadata(self, metadata: List[Dict[str, Any]]):
+        """
+        Appends the metadata of new rows to their columns, before the rows'
+        log lines are written.
+        """
+        first_row = len(self.ids)
+        by_field: Dict[str, Tuple[List[int], List[Any]]] = {}
+        for row, fields in enumerate(metadata, start=first_row):
+            for name, value in fields.items():
+                if value is not None:
+                    rows, values = by_field.setdefault(name, ([], []))
+                    rows.append(row)
+                    values.append(value)
+        os.makedirs(self._file(self.COLUMNS_DIR), exist_ok=True)
+        for name, (rows, values) in by_field.items():
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = MetadataColumn(self._column_prefix(name))
+            column.append(rows, values, first_row)
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self.refresh()
+            entries = [{"delete": chunk_id} for chunk_id in dict.fromkeys(ids) if chunk_id in self.id_to_row]
+            if entries:
+                self._append_log(entries)
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        return {"total_vector_count": len(self.id_to_row), "dimension": self.dimension or 0}
+
+
+class IVFVectorStore(LocalVectorStore):
+    """
+    A local vector store with an inverted-file (IVF) approximate index on top of
+    the flat embedding matrix.
+
+    Rows are clustered around `n_lists` centroids (spherical k-means). A query
+    only scores the rows of its `n_probe` closest clusters, so raising
+    `n_probe` trades latency for recall. Training persists the centroids and
+    the rows grouped by cluster, opened memory-mapped. Rows appended after
+    training get their nearest centroid appended to `ivf_assignments.i32`
+    and are searched by scanning that tail, so inserts never rewrite the
+    inverted lists. The index re-trains itself once the tail outgrows the
+    trained rows, and first trains once it holds `min_train_size` rows;
+    until then queries fall back to exact search. Call `train` to re-cluster
+    after large changes.
+    """
+
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    ORDER_FILE = "ivf_order.npy"
+    OFFSETS_FILE = "ivf_offsets.npy"
+    ASSIGNMENTS_FILE = "ivf_assignments.i32"
+    IVF_FILE = "ivf.json"
+
+    def __init__(self, path: str, n_lists: int = 0, n_probe: int = 8, min_train_size: int = 10000):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        super().__init__(path)
+
+    def _reset(self):
+        super()._reset()
+        self.centroids = None
+        self.order = None
+        self.offsets = None
+        self.assignments = None
+        # Rows covered by the inverted lists; later rows are in the tail
+        self.trained_rows = 0
+        self._ivf_version = None
+
+    def refresh(self) -> bool:
+        with self._lock:
+            changed = super().refresh()
+            ivf_path = self._file(self.IVF_FILE)
+            version = os.stat(ivf_path).st_mtime_ns if os.path.exists(ivf_path) else None
+            if version != self._ivf_version:
+                self._ivf_version = version
+                if version is None:
+                    self.centroids = self.order = self.offsets = None
+                    self.trained_rows = 0
+                else:
+                    with open(ivf_path, "r", encoding="utf-8") as f:
+                        self.trained_rows = json.load(f)["trained_rows"]
+                    self.centroids, self.order, self.offsets = (
+                        np.load(self._file(name), mmap_mode="r")
+                        for name in (self.CENTROIDS_FILE, self.ORDER_FILE, self.OFFSETS_FILE)
+                    )
+                changed = True
+            if not changed:
+                # Called on every search; nothing to remap
+                return False
+            n = len(self.ids)
+            if self.centroids is not None and n:
+                self.assignments = np.memmap(self._file(self.ASSIGNMENTS_FILE), dtype=np.int32, mode="r", shape=(n,))
+            else:
+                self.assignments = None
+            return True
+
+    def _assign(self, embeddings: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        """
+        Returns the nearest centroid of every row, in bounded-memory batches.
+        """
+        assignments = np.empty(len(embeddings), dtype=np.int32)
+        for start in range(0, len(embeddings), batch_size):
+            batch = np.asarray(embeddings[start:start + batch_size], dtype=np.float32)
+            assignments[start:start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+        return assignments
+
+    def _kmeans(self, embeddings: np.ndarray, n_lists: int, rows: Optional[np.ndarray] = None,
+                iterations: int = 10, sample_size: int = 256 * 1024, seed: int = 0) -> np.ndarray:
+        """
+        Spherical k-means over a sample of the rows (all rows by default).
+        """
+        rng = np.random.default_rng(seed)
+        rows = np.arange(len(embeddings)) if rows is None else rows
+        sample_rows = np.sort(rng.choice(rows, size=min(len(rows), sample_size), replace=False))
+        sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            empty = np.bincount(assignments, minlength=n_lists) == 0
+            # Re-seed empty clusters with random sample rows
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = self._normalize(sums)
+        return centroids
+
+    def _write_ivf(self, centroids: np.ndarray, assignments: np.ndarray):
+        """
+        Persists the IVF structures: per-row assignments, centroids, and the
+        live rows grouped by cluster with per-cluster offsets. `ivf.json` is
+        written last; readers reload the rest when it changes.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        live_rows = np.flatnonzero(self._live[:len(assignments)])
+        order = live_rows[np.argsort(assignments[live_rows], kind="stable")].astype(np.int64)
+        counts = np.bincount(assignments[live_rows], minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        target = self._file(self.ASSIGNMENTS_FILE)
+        with open(target + ".tmp", "wb") as f:
+            f.write(np.ascontiguousarray(assignments, dtype=np.int32).tobytes())
+        os.replace(target + ".tmp", target)
+        for name, array in ((self.CENTROIDS_FILE, centroids), (self.ORDER_FILE, order), (self.OFFSETS_FILE, offsets)):
+            target = self._file(name)
+            np.save(target + ".tmp.npy", array)
+            os.replace(target + ".tmp.npy", target)
+        target = self._file(self.IVF_FILE)
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"trained_rows": len(assignments), "n_lists": len(centroids)}, f)
+        os.replace(target + ".tmp", target)
+
+    def train(self, n_lists: Optional[int] = None):
+        """
+        (Re)clusters all live rows and rebuilds the inverted lists.
+        """
+        with self._lock:
+            self.refresh()
+            self._train(n_lists)
+            self.refresh()
+
+    def _train(self, n_lists: Optional[int] = None):
+        n = len(self.ids)
+        live_rows = np.flatnonzero(self._live[:n])
+        if self.embeddings is None or len(live_rows) == 0:
+            return
+        n_lists = n_lists or self.n_lists or max(1, int(4 * np.sqrt(len(live_rows))))
+        n_lists = min(n_lists, len(live_rows))
+        print(f"Training IVF index with {n_lists} lists over {len(live_rows)} vectors...")
+        centroids = self._kmeans(self.embeddings, n_lists, rows=live_rows)
+        self._write_ivf(centroids, self._assign(self.embeddings, centroids))
+
+    def _append_rows(self, rows: np.ndarray):
+        if self.centroids is not None:
+            assignments = self._assign(rows, np.asarray(self.centroids))
+            self._append(self.ASSIGNMENTS_FILE, assignments.tobytes(), len(self.ids) * 4)
+        super()._append_rows(rows)
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        with self._lock:
+            super().upsert(vectors)
+            if self.centroids is None:
+                retrain = len(self.id_to_row) >= self.min_train_size
+            else:
+                # Re-cluster once the unindexed tail outgrows the trained rows,
+                # so queries never scan more than half the index linearly.
+                retrain = len(self.ids) - self.trained_rows > max(self.trained_rows, self.min_train_size)
+            if retrain:
+                self._train()
+                self.refresh()
+
+    def _candidates(self, query_vector: np.ndarray, filter: Optional[Dict[str, Any]]):
+        # A concurrent refresh maps the embeddings before the assignments, so
+        # rows not assigned yet are left out until it finishes.
+        assignments = self.assignments
+        if self.centroids is None or assignments is None:
+            return super()._candidates(query_vector, filter)
+
+        embeddings = self.embeddings
+        n = min(len(embeddings), len(assignments))
+        n_probe = min(self.n_probe, len(self.centroids))
+        centroid_scores = self.centroids @ query_vector
+        probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        rows = [self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe]
+        if n > self.trained_rows:
+            tail = np.arange(self.trained_rows, n)
+            rows.append(tail[np.isin(assignments[self.trained_rows:n], probe)])
+        rows = np.concatenate(rows)
+        rows.sort()  # sequential access into the memory-mapped matrix
+        scores = embeddings[rows] @ query_vector
+        mask = self._live[:n][rows]
+        if filter:
+            # Only the probed rows, so a filtered query stays sublinear
+            mask &= self._filter_mask(filter, rows)
+        return rows, np.where(mask, scores, -np.inf)
+
+
+def create_vector_store(index_name: str) -> VectorStore:
+    """
+    Creates the vector store selected by `settings.VECTOR_BACKEND`.
+    """
+    backend = settings.VECTOR_BACKEND.lower()
+    if backend == "pinecone":
+        return PineconeVectorStore(settings.PINECONE_API_KEY, index_name)
+    if backend == "local":
+        path = os.path.join(settings.LOCAL_INDEX_PATH, index_name)
+        if settings.LOCAL_INDEX_TYPE.lower() == "ivf":
+            return IVFVectorStore(
+                path,
+                n_lists=settings.IVF_N_LISTS,
+                n_probe=settings.IVF_N_PROBE,
+                min_train_size=settings.IVF_MIN_TRAIN_SIZE,
+            )
+        return LocalVectorStore(path)
+    raise ValueError(f"Unknown vector backend: '{settings.VECTOR_BACKEND}'")
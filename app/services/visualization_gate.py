@@ -0,0 +1,101 @@
+import re
+from typing import Dict, Optional
+
+# Words in the query that ask for a chart outright.
+CHART_WORDS = re.compile(r"\b(chart|charts|graph|graphs|plot|plots|visuali[sz]e|visuali[sz]ation|diagram|histogram)\b", re.I)
+
+# Words that ask for a comparison, trend or quantity.
+COMPARISON_WORDS = re.compile(
+    r"\b(compare|compared|comparison|comparing|versus|vs\.?|difference|differences|trend|trends|over time|"
+    r"increase|increases|increased|decrease|decreases|decreased|decline|change|changes|rate|rates|"
+    r"how much|how many|percentage|percent|proportion|distribution|dose|doses|levels?|amount|"
+    r"higher|lower|more than|less than|fold|ratio|statistics|measurements?|quantif\w*)\b",
+    re.I,
+)
+
+# Questions that ask for a definition or explanation rather than data.
+EXPLANATION_WORDS = re.compile(
+    r"^\s*(what is|what are|what does|define|definition|explain|describe|who|why|how does|how do|"
+    r"tell me about|overview|summari[sz]e the concept)\b",
+    re.I,
+)
+
+NUMBER = re.compile(r"(?<![\w.])[-+]?\d+(?:[.,]\d+)?(?![\w.]*[a-zA-Z])")
+YEAR = re.compile(r"\b(19|20)\d{2}\b")
+PERCENT = re.compile(r"\d\s*%|\bpercent\b", re.I)
+UNIT = re.compile(
+    r"\d\s*(mg|g|kg|µg|ug|ml|l|mm|cm|m|km|s|ms|min|h|hr|hrs|hours|days|weeks|months|years|"
+    r"gy|mgy|sv|msv|°c|c|k|hz|khz|mhz|pa|kpa|mmhg|bpm|fold|x)\b",
+    re.I,
+)
+WORD = re.compile(r"\w+")
+
+
+def gate_features(query: str, text: str) -> Dict[str, float]:
+    """
+    Counts the signals the gate scores: chart, comparison and explanation words
+    in the query, and the density of numbers, years, percentages, units and
+    comparison words in the text. Text features are per 100 words, so a long
+    packed context scores like a short snippet of the same kind.
+    """
+    words = max(len(WORD.findall(text)), 1)
+    years = len(YEAR.findall(text))
+    numbers = max(len(NUMBER.findall(text)) - years, 0)
+    return {
+        "query_chart": len(CHART_WORDS.findall(query)),
+        "query_comparison": len(COMPARISON_WORDS.findall(query)),
+        "query_explanation": 1 if EXPLANATION_WORDS.search(query) else 0,
+        "numbers_per_100_words": 100.0 * numbers / words,
+        "years_per_100_words": 100.0 * years / words,
+        "percentages_per_100_words": 100.0 * len(PERCENT.findall(text)) / words,
+        "units_per_100_words": 100.0 * len(UNIT.findall(text)) / words,
+        "text_comparison_per_100_words": 100.0 * len(COMPARISON_WORDS.findall(text)) / words,
+    }
+
+
+# Most the text can add to the score. It stays below the gap between the
+# thresholds, so numeric text alone never makes a YES: the query has to ask
+# for a chart or a comparison, and otherwise the LLM check decides.
+MAX_TEXT_SCORE = 2.5
+
+
+def visualization_score(query: str, text: str) -> float:
+    """
+    Scores how likely the query and text are to produce a useful chart. Higher
+    is more likely; the query's intent weighs more than the text, because
+    research text almost always contains some numbers.
+    """
+    f = gate_features(query, text)
+    score = 0.0
+    score += 3.0 * min(f["query_chart"], 1)
+    score += 1.5 * min(f["query_comparison"], 2)
+    score -= 1.5 * f["query_explanation"]
+    text_score = 0.0
+    text_score += min(f["numbers_per_100_words"] / 4.0, 1.0)
+    text_score += min(f["percentages_per_100_words"] / 2.0, 0.75)
+    text_score += min(f["units_per_100_words"] / 4.0, 0.5)
+    text_score += 0.25 if f["years_per_100_words"] >= 1.0 else 0.0
+    text_score += min(f["text_comparison_per_100_words"] / 4.0, 0.5)
+    return score + min(text_score, MAX_TEXT_SCORE)
+
+
+def visualization_gate(query: str, text: str, yes_threshold: float, no_threshold: float) -> Optional[bool]:
+    """
+    Decides locally whether to attempt a visualization.
+
+    Args:
+        query: The user's query.
+        text: The text the chart would be built from.
+        yes_threshold: Scores at or above this are a confident YES.
+        no_threshold: Scores at or below this are a confident NO.
+
+    Returns:
+        True or False when the score is clear, or None when the case is
+        ambiguous and should go to the LLM check.
+    """
+    score = visualization_score(query, text)
+    if score >= yes_threshold:
+        return True
+    if score <= no_threshold:
+        return False
+    return None
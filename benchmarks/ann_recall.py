@@ -0,0 +1,78 @@
+"""
+Measures recall@k and latency of the IVF index against exact search.
+
+Usage:
+    python -m benchmarks.ann_recall --index data/index/research-papers --k 10 --probes 1 4 8 16 32
+
+Without --index a random corpus is generated so the knobs can be explored
+offline.
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from app.services.vector_store import LocalVectorStore, IVFVectorStore
+
+
+def build_random_index(path: str, n: int, dim: int, seed: int = 0):
+    """
+    Writes a clustered random corpus to `path` as a flat local index.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 500), dim))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.5 * rng.normal(size=(n, dim))
+    store = LocalVectorStore(path)
+    batch = 50000
+    for start in range(0, n, batch):
+        store.upsert([
+            {"id": f"chunk-{i}", "values": vectors[i].tolist(), "metadata": {}}
+            for i in range(start, min(n, start + batch))
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", help="Path of an existing local index. Defaults to a random corpus.")
+    parser.add_argument("--n", type=int, default=100000, help="Size of the random corpus.")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the random corpus.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=0, help="Number of IVF lists (0 = ~4*sqrt(N)).")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    path = args.index
+    if path is None:
+        path = tempfile.mkdtemp(prefix="ann-bench-")
+        print(f"Building random corpus of {args.n} x {args.dim} in {path}...")
+        build_random_index(path, args.n, args.dim)
+
+    exact = LocalVectorStore(path)
+    ivf = IVFVectorStore(path, n_lists=args.lists, min_train_size=1)
+    if ivf.centroids is None:
+        ivf.train(args.lists or None)
+
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(exact.ids), size=min(args.queries, len(exact.ids)), replace=False)
+    # Perturb stored vectors so queries are near, but not exactly on, indexed rows
+    queries = np.asarray(exact.embeddings[rows]) + 0.1 * rng.normal(size=(len(rows), exact.embeddings.shape[1]))
+
+    start = time.perf_counter()
+    truth = [{m["id"] for m in exact.query(q.tolist(), args.k, include_metadata=False)["matches"]} for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"exact: {exact_ms:.3f} ms/query")
+
+    for n_probe in args.probes:
+        ivf.n_probe = n_probe
+        hits = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            found = {m["id"] for m in ivf.query(q.tolist(), args.k, include_metadata=False)["matches"]}
+            hits += len(found & expected)
+        ivf_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = hits / sum(len(t) for t in truth)
+        print(f"ivf n_probe={n_probe:<4} recall@{args.k}={recall:.3f}  {ivf_ms:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compares the embedding backends: cosine parity against the PyTorch model,
+load time, per-query latency and resident memory.
+
+Usage:
+    python -m benchmarks.embedding_backends
+    python -m benchmarks.embedding_backends --onnx-file onnx/model_qint8_avx512.onnx
+
+Each backend runs in its own subprocess so load time and RSS are measured
+from a clean interpreter.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+SENTENCES = [
+    "Effects of microgravity on bone density in astronauts",
+    "How does spaceflight affect the immune system?",
+    "Plant growth experiments aboard the International Space Station",
+    "Radiation exposure risks for long-duration Mars missions",
+    "Muscle atrophy countermeasures during six-month missions",
+    "Gene expression changes in Arabidopsis under simulated microgravity",
+    "Cardiovascular deconditioning after return to Earth",
+    "What are the knowledge gaps in space biology research?",
+    "Bacterial virulence in spaceflight conditions",
+    "Sleep and circadian rhythm disruption in crew members",
+]
+
+
+def run_backend(backend: str, output: str, repeats: int):
+    """
+    Loads one backend, encodes the sample sentences and prints its stats as JSON.
+    """
+    os.environ["EMBEDDING_BACKEND"] = backend
+    start = time.perf_counter()
+    from app.services.embedding_model import load_embedding_model
+    from app.services.rag_service import RAGService
+    model = load_embedding_model(RAGService.MODEL_NAME)
+    load_seconds = time.perf_counter() - start
+
+    embeddings = np.asarray(model.encode(SENTENCES), dtype=np.float32)
+    np.save(output, embeddings)
+
+    model.encode(SENTENCES[0])  # warm-up
+    latencies = []
+    for _ in range(repeats):
+        for sentence in SENTENCES:
+            start = time.perf_counter()
+            model.encode(sentence)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        # ru_maxrss is in kilobytes on Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--onnx-file", default=None, help="ONNX export to compare (ONNX_MODEL_FILE).")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Fail if parity drops below this.")
+    parser.add_argument("--run-backend", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_backend:
+        run_backend(args.run_backend, args.output, args.repeats)
+        return
+
+    results = {}
+    embeddings = {}
+    workdir = tempfile.mkdtemp(prefix="embedding-bench-")
+    for backend in ("torch", "onnx"):
+        output = os.path.join(workdir, f"{backend}.npy")
+        env = dict(os.environ)
+        if args.onnx_file:
+            env["ONNX_MODEL_FILE"] = args.onnx_file
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.embedding_backends", "--run-backend", backend,
+             "--output", output, "--repeats", str(args.repeats)],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        results[backend] = json.loads(completed.stdout.strip().splitlines()[-1])
+        embeddings[backend] = np.load(output)
+
+    for backend, stats in results.items():
+        print(f"{backend:<6} load {stats['load_seconds']:.2f}s  p50 {stats['p50_ms']:.2f} ms  "
+              f"p95 {stats['p95_ms']:.2f} ms  max RSS {stats['max_rss_mb']:.0f} MB")
+
+    reference = embeddings["torch"] / np.linalg.norm(embeddings["torch"], axis=1, keepdims=True)
+    candidate = embeddings["onnx"] / np.linalg.norm(embeddings["onnx"], axis=1, keepdims=True)
+    cosines = (reference * candidate).sum(axis=1)
+    print(f"parity: min cosine {cosines.min():.5f}, mean cosine {cosines.mean():.5f}")
+    if cosines.min() < args.min_cosine:
+        sys.exit(f"Parity check failed: min cosine {cosines.min():.5f} < {args.min_cosine}")
+
+
+if __name__ == "__main__":
+    main()
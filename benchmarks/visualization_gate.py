@@ -0,0 +1,162 @@
+"""
+Evaluates the local visualization gate against labelled YES/NO decisions:
+agreement on the cases it decides, how many cases it leaves to the LLM
+check, and per-call latency.
+
+Usage:
+    python -m benchmarks.visualization_gate
+    python -m benchmarks.visualization_gate --yes 3.5 --no 1.0
+    python -m benchmarks.visualization_gate --packed    # all texts packed into one context
+    python -m benchmarks.visualization_gate --build     # needs the index and GROQ_API_KEY
+    python -m benchmarks.visualization_gate --relabel   # needs GROQ_API_KEY
+
+In production the gate scores the packed retrieved context (thousands of
+tokens), not a short snippet. --build rebuilds the eval file from that:
+each query in benchmarks/data/visualization_gate_queries.txt is retrieved
+and packed exactly as SummarizeService does for the visualization check,
+and labelled with the live decision of SummarizeService._should_visualize.
+--relabel only refreshes the labels of the existing cases, e.g. after the
+prompt or model changes.
+
+Cases marked "synthetic" are hand-labelled short snippets kept for offline
+runs; agreement is reported separately for each case source.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import numpy as np
+
+from app.config import settings
+from app.services.visualization_gate import visualization_gate, visualization_score
+
+EVAL_PATH = os.path.join(os.path.dirname(__file__), "data", "visualization_gate_eval.jsonl")
+QUERIES_PATH = os.path.join(os.path.dirname(__file__), "data", "visualization_gate_queries.txt")
+
+
+def load_cases(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_cases(cases, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for case in cases:
+            f.write(json.dumps(case) + "\n")
+
+
+async def build(queries_path: str, path: str):
+    """
+    Rebuilds the eval file from the contexts the gate sees in production and
+    the LLM check's decisions on them.
+    """
+    from app.services.context_builder import context_budget, truncate_to_budget
+    from app.services.summarize_service import SummarizeService
+    service = SummarizeService()
+    with open(queries_path, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    cases = []
+    for query in queries:
+        _, retrieved_texts = await service._retrieve(query)
+        if not retrieved_texts:
+            print(f"skipped, nothing retrieved: {query}")
+            continue
+        text, _ = service._visualization_context(retrieved_texts)
+        text = truncate_to_budget(text, context_budget(service.fast_model))
+        label = "YES" if await service._should_visualize(query, text) else "NO"
+        cases.append({"query": query, "text": text, "label": label, "source": "retrieved"})
+    save_cases(cases, path)
+    print(f"built {len(cases)} cases from retrieved contexts")
+    return cases
+
+
+async def relabel(cases, path: str):
+    """
+    Replaces each case's label with the LLM check's decision and rewrites the file.
+    """
+    from app.services.summarize_service import SummarizeService
+    service = SummarizeService()
+    changed = 0
+    for case in cases:
+        label = "YES" if await service._should_visualize(case["query"], case["text"]) else "NO"
+        changed += label != case["label"]
+        case["label"] = label
+    save_cases(cases, path)
+    print(f"relabelled {len(cases)} cases, {changed} changed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eval-file", default=EVAL_PATH)
+    parser.add_argument("--yes", type=float, default=settings.VISUALIZATION_GATE_YES)
+    parser.add_argument("--no", type=float, default=settings.VISUALIZATION_GATE_NO)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--queries-file", default=QUERIES_PATH, help="Queries for --build, one per line.")
+    parser.add_argument("--build", action="store_true",
+                        help="Rebuild the eval file from retrieved contexts and LLM labels first.")
+    parser.add_argument("--relabel", action="store_true", help="Refresh labels from the LLM check first.")
+    parser.add_argument("--verbose", action="store_true", help="Print the score and decision of every case.")
+    parser.add_argument("--packed", action="store_true",
+                        help="Score every query against all case texts packed into one context, as a "
+                             "check that long contexts do not push the gate towards YES.")
+    args = parser.parse_args()
+
+    if args.build:
+        cases = asyncio.run(build(args.queries_file, args.eval_file))
+    else:
+        cases = load_cases(args.eval_file)
+    if args.relabel:
+        asyncio.run(relabel(cases, args.eval_file))
+
+    if args.packed:
+        from app.services.context_builder import pack_context
+        packed, _ = pack_context(list(dict.fromkeys(case["text"] for case in cases)), 3000)
+        cases = [dict(case, text=packed) for case in cases]
+
+    decided = agreed = 0
+    # case source -> [decided, agreed]
+    by_source = {}
+    disagreements = []
+    for case in cases:
+        decision = visualization_gate(case["query"], case["text"], args.yes, args.no)
+        if args.verbose:
+            score = visualization_score(case["query"], case["text"])
+            shown = "LLM" if decision is None else ("YES" if decision else "NO")
+            print(f"{score:5.2f} {shown:<3} label {case['label']:<3} {case['query']}")
+        if decision is None:
+            continue
+        counts = by_source.setdefault(case.get("source", "synthetic"), [0, 0])
+        decided += 1
+        counts[0] += 1
+        if ("YES" if decision else "NO") == case["label"]:
+            agreed += 1
+            counts[1] += 1
+        else:
+            disagreements.append(case["query"])
+
+    latencies = []
+    for _ in range(args.repeats):
+        for case in cases:
+            start = time.perf_counter()
+            visualization_gate(case["query"], case["text"], args.yes, args.no)
+            latencies.append((time.perf_counter() - start) * 1e6)
+
+    print(f"cases {len(cases)}  decided locally {decided} ({decided / len(cases):.0%})  "
+          f"sent to LLM {len(cases) - decided}")
+    print(f"agreement on decided cases {agreed}/{decided}")
+    for source, (source_decided, source_agreed) in sorted(by_source.items()):
+        print(f"  {source}: {source_agreed}/{source_decided}")
+    if "retrieved" not in by_source:
+        print("warning: no cases from retrieved contexts; run with --build to check the gate "
+              "against the contexts it scores in production")
+    print(f"latency p50 {np.percentile(latencies, 50):.1f} us  p95 {np.percentile(latencies, 95):.1f} us")
+    for query in disagreements:
+        print(f"disagrees: {query}")
+    if disagreements:
+        sys.exit(f"{len(disagreements)} decided cases disagree with the labels")
+
+
+if __name__ == "__main__":
+    main()
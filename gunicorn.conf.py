@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration that loads the embedding model and the local indexes
+once in the master process and forks the uvicorn workers from it, so the
+workers share those read-only pages copy-on-write instead of each loading
+their own copy.
+
+Usage:
+    gunicorn app.main:app -c gunicorn.conf.py
+
+Set WEB_CONCURRENCY to the number of workers and PRELOAD_MODELS=0 to load
+the models in each worker instead.
+"""
+import gc
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workers load in the background and report through /readyz
+timeout = 120
+
+preload_models = os.environ.get("PRELOAD_MODELS", "1") != "0"
+preload_app = preload_models
+
+
+_preloaded = False
+
+
+def on_starting(server):
+    global _preloaded
+    if not preload_models:
+        return
+    from app.services.rag_service import get_rag_service
+    try:
+        get_rag_service(preload=True)
+        _preloaded = True
+    except Exception as e:
+        # Workers build their own services (and retry) in their lifespan
+        server.log.warning(f"Preloading the RAG service failed, workers will load it themselves: {e}")
+    # Move everything allocated so far out of the garbage collector's view,
+    # so collections in the workers do not write to (and un-share) those pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not _preloaded:
+        return
+    from app.services.rag_service import get_rag_service
+    get_rag_service().after_fork()